@@ -1,127 +1,190 @@
-
 import os
-import json
-import uuid
-import getpass
-from pathlib import Path
-from datetime import datetime
-import pandas as pd
-
-from preprocessor import extract_file_metadata
-from build_rst_graph import build_rst_graph
+import argparse
+
+from preprocessor import process_folder_incremental
+from action_store import load_actions, export_json, read_folder_info, iter_folder_files
+from action_dedup import collapse_near_duplicates
+from file_parser import llm_cache, llm_scheduler
+from build_rst_graph import build_rst_graph, assign_array_groups
 from infer_causal_paths import infer_causal_paths
 from build_combined_graph import build_combined_graph
+from relation_matrix import build_relation_matrix, build_action_features
+from candidate_pairs import generate_candidate_pairs, estimate_candidate_recall
+from relation_store import save_relation_matrix, append_relation_matrix, load_relation_matrix
+from incremental_graph import add_actions_to_graphs, add_files_to_graph, save_graphs, load_graphs
+from folder_watch import watch_folders
 from graph_visualizer import visualize_graph
-from config import RST_THRESHOLD, CAUSAL_THRESHOLD, WEIGHTS, OUTPUT_FOLDER
+from config import RST_THRESHOLD, CAUSAL_THRESHOLD, WEIGHTS, OUTPUT_FOLDER, RELATION_STORE_DIR, RELATION_STORE_DTYPE
+from config import ACTION_STORE_PATH, ACTION_JSON_EXPORT_PATH, ACTION_LOAD_CHUNK_ROWS
+from config import DEDUP_ENABLED, DEDUP_MIN_JACCARD, DEDUP_TIME_TOLERANCE_SECONDS
+from config import GRAPH_STORE_DIR, GRAPH_COMMUNITY_GROUPS, WATCH_FOLDERS, WATCH_EMIT_SECONDS
+from config import INGEST_MANIFEST_PATH, CAUSAL_MAX_GAP_SECONDS, CANDIDATE_MODE, CANDIDATE_TOP_K, CANDIDATE_MAX_BLOCK, CANDIDATE_RECALL_SAMPLE
 from build_rdf_graph import build_rdf_graph,visualize_rdf_graph
 
-def process_folder(folder_path):
-    folder_id = str(uuid.uuid4())
-    folder_data = {
-        "folderID": folder_id,
-        "folderPath": str(folder_path),
-        "folderOwner": getpass.getuser(),
-        "files": []
-    }
-
-    for root, dirs, files in os.walk(folder_path):
-        for file_name in files:
-            file_path = Path(root) / file_name
-            file_metadata = extract_file_metadata(file_path, folder_id)
-            folder_data["files"].append(file_metadata)
-
-    return folder_data
-
-def save_output(data, output_path):
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-
-def load_caren_actions(json_path):
-    with open(json_path, "r", encoding="utf-8") as f:
-        caren_data = json.load(f)
-
-    all_actions = []
-    for file in caren_data.get("files", []):
-        meta = file.get("metadata", {})
-        for idx, action in enumerate(file.get("actions", [])):
-            if isinstance(action, dict) and action.get("action"):
-                all_actions.append({
-                    "A": action.get("action"),
-                    "T_A": action.get("timestamp"),
-                    "T_S": file.get("modifiedTime"),
-                    "ID": f"{file.get('fileID')}_{idx}", # ✅ identity
-                    "C": action.get("context"),
-                    "M": json.dumps({
-                        "device_id": meta.get("device_id"),
-                        "user_id": meta.get("user_id"),
-                        "address": meta.get("address"),
-                        "card_number": meta.get("card_number"),
-                        "ip_address": meta.get("ip_address")
-                    }, ensure_ascii=False)
-                })
-
-                action_obj = {
-                    "A": action.get("action"),
-                    "T_A": action.get("timestamp"),
-                    "T_S": file.get("modifiedTime"),
-                    "ID": json.dumps({
-                        "device_id": meta.get("device_id"),
-                        "user_id": meta.get("user_id")}),
-                    "C": action.get("context"),
-                    "M": json.dumps({
-                        "address": meta.get("address"),
-                        "card_number": meta.get("card_number"),
-                        "ip_address": meta.get("ip_address")
-                    }, ensure_ascii=False)
-                }
-
-                # 출력
-                print(f"[{idx}] Action: {action_obj['A']}")
-                print(f"     Context: {action_obj['C']}")
-                print(f"     Timestamp: {action_obj['T_A']}")
-                print(f"     Metadata: {action_obj['M']}")
-                print(f"     ID: {action_obj['ID']}")
-
-
-                print("-" * 50)
-
-    return pd.DataFrame(all_actions)
-
-
-def main_pipeline(input_folder, output_file):
-
+def pipeline_paths(name=None):
+    # 폴더 하나면 config 경로 그대로, 여러 폴더를 함께 watch 하면 OUTPUT_FOLDER/<name>/ 아래에 폴더별 상태를 둠
+    if name is None:
+        return {"store": ACTION_STORE_PATH, "manifest": INGEST_MANIFEST_PATH, "json_export": ACTION_JSON_EXPORT_PATH,
+                "relation_dir": RELATION_STORE_DIR, "graph_dir": GRAPH_STORE_DIR, "output_dir": OUTPUT_FOLDER}
+    base = os.path.join(OUTPUT_FOLDER, name)
+    os.makedirs(base, exist_ok=True)
+    return {"store": os.path.join(base, "caren_actions.jsonl"), "manifest": os.path.join(base, "caren_manifest.json"),
+            "json_export": None, "relation_dir": os.path.join(base, "relation"),
+            "graph_dir": os.path.join(base, "graphs"), "output_dir": base}
+
+def ingest_folder(input_folder, paths):
     # Step 1: CAREN preprocessing
-    result = process_folder(input_folder)
-    save_output(result, output_file)
-    print(f"✅ CAREN preprocessed output saved to: {output_file}")
-
-    # Step 2: Load actions and build graphs
-    df = load_caren_actions(output_file)
+    # manifest 기준으로 새 파일/변경된 파일만 다시 파싱하고, 파일 단위로 JSONL store 에 기록
+    store_file = paths["store"]
+    changes = process_folder_incremental(input_folder, store_file, paths["manifest"])
+    print(f"✅ CAREN action store saved to: {store_file}")
+    if paths["json_export"]:
+        export_json(store_file, paths["json_export"])
+    if llm_cache is not None:
+        print(f"🗄️ LLM cache: {llm_cache.stats()}")
+    print(f"📡 LLM requests: {llm_scheduler.stats()}")
+
+    df = load_actions(store_file, chunksize=ACTION_LOAD_CHUNK_ROWS)
     print(f"📦 Loaded {len(df)} actions")
-
-    rst_graph = build_rst_graph(df, threshold=RST_THRESHOLD)
-    print(f"🔎 RST graph nodes: {len(rst_graph.nodes())}, edges: {len(rst_graph.edges())}")
+    return df, changes
+
+def main_pipeline(input_folder, store_file, paths=None):
+
+    paths = dict(paths or pipeline_paths(), store=store_file)
+    df, _ = ingest_folder(input_folder, paths)
+    return build_graphs(df, paths)
+
+def emit_views(graphs, output_dir):
+    visualize_graph(graphs["rst"], output_file=os.path.join(output_dir, "rst_graph.html"), directed=False)
+    visualize_graph(graphs["causal"], output_file=os.path.join(output_dir, "causal_graph.html"), directed=True)
+    visualize_graph(graphs["combined"], output_file=os.path.join(output_dir, "combined_graph.html"), directed=True)
+    visualize_rdf_graph(graphs["rdf"], output_file=os.path.join(output_dir, "rdf_graph.html"))
+
+def build_graphs(df, paths, views=True):
+    # Step 2: Build graphs from the loaded actions
+    if DEDUP_ENABLED:
+        # 여러 출처에서 추출된 같은 이벤트를 하나의 node 로 (O(n²) 단계 전에 n 을 줄임)
+        df = collapse_near_duplicates(df, DEDUP_MIN_JACCARD, DEDUP_TIME_TOLERANCE_SECONDS)
+
+    # Step 3: f_I/f_S/f_C/f_M 을 한 번만 계산해 모든 그래프가 공유
+    features = build_action_features(df)
+    pairs = None
+    if CANDIDATE_MODE:
+        pairs = generate_candidate_pairs(features, df, k=CANDIDATE_TOP_K, max_block=CANDIDATE_MAX_BLOCK)
+        estimate_candidate_recall(features, pairs, RST_THRESHOLD, CAUSAL_THRESHOLD, WEIGHTS,
+                                  sample_size=CANDIDATE_RECALL_SAMPLE)
+    relation = build_relation_matrix(df, features=features, pairs=pairs)
+    save_relation_matrix(relation, df, paths["relation_dir"], dtype=RELATION_STORE_DTYPE)
+
+    rst_graph = build_rst_graph(df, threshold=RST_THRESHOLD, relation=relation)
+    print(f"🔎 RST graph nodes: {rst_graph.number_of_nodes()}, edges: {rst_graph.number_of_edges()}")
 
     # ✅ (2) 모든 엣지의 relation 값 출력 (없으면 fallback)
     for u, v, data in rst_graph.edges(data=True):
         rel = data.get("relation") or data.get("type") or "?"
         print(f"🔗 {u} → {v} | relation: {rel}")
 
-    visualize_graph(rst_graph, output_file=os.path.join(OUTPUT_FOLDER, "rst_graph.html"), directed=False)
-
-    causal_graph = infer_causal_paths(df, threshold=CAUSAL_THRESHOLD, weights=WEIGHTS)
-    visualize_graph(causal_graph, output_file=os.path.join(OUTPUT_FOLDER, "causal_graph.html"), directed=True)
-
-    combined_graph = build_combined_graph(rst_graph, causal_graph)
-    visualize_graph(combined_graph, output_file="outputs/combined_graph.html", directed=True)
-
-    G = build_rdf_graph("caren_preprocessed_output.json")
-    visualize_rdf_graph(G, output_file="outputs/rdf_graph.html")
+    causal_graph = infer_causal_paths(df, threshold=CAUSAL_THRESHOLD, weights=WEIGHTS, relation=relation,
+                                      max_gap=CAUSAL_MAX_GAP_SECONDS)
+    combined_graph = build_combined_graph(rst_graph, causal_graph, relation=relation)
+    if GRAPH_COMMUNITY_GROUPS:
+        # 증분 갱신은 새 node 만 이웃 group 에 배정하므로 전체 재구성 때 community 를 한 번 계산해 둠
+        assign_array_groups(rst_graph)
+        assign_array_groups(combined_graph)
+
+    G = build_rdf_graph(paths["store"])
+    graphs = {"rst": rst_graph, "causal": causal_graph, "combined": combined_graph, "rdf": G}
+    if views:
+        emit_views(graphs, paths["output_dir"])
 #    print("✅ Graph visualization saved to: outputs/combined_graph.html")
+    save_graphs(graphs, paths["graph_dir"])
+    return graphs
+
+def update_pipeline(input_folder, paths=None, views=True):
+    # 새로 추가된 파일의 action 만 기존 그래프에 반영. 이전 파일이 바뀌거나 사라졌으면 전체 재구성
+    paths = paths or pipeline_paths()
+    df, changes = ingest_folder(input_folder, paths)
+    graphs = load_graphs(paths["graph_dir"])
+    if graphs is None or not os.path.exists(os.path.join(paths["relation_dir"], "meta.json")):
+        print("♻️ No saved graphs → full build")
+        return build_graphs(df, paths, views)
+    if changes["changed"] or changes["deleted"]:
+        print(f"♻️ {len(changes['changed'])} changed, {len(changes['deleted'])} deleted files → full rebuild")
+        return build_graphs(df, paths, views)
+    relation, known_df = load_relation_matrix(paths["relation_dir"])
+
+    known_ids = set(known_df["ID"])
+    if "merged_ids" in known_df.columns:
+        known_ids.update(i for ids in known_df["merged_ids"] if isinstance(ids, list) for i in ids)
+    removed = known_ids - set(df["ID"])
+    if removed:
+        print(f"♻️ {len(removed)} previously graphed actions changed or removed → full rebuild")
+        return build_graphs(df, paths, views)
+
+    rows = []
+    if DEDUP_ENABLED:
+        # 전체 재구성과 같은 cluster 를 얻도록 기존 action 까지 포함해 묶음
+        df = collapse_near_duplicates(df, DEDUP_MIN_JACCARD, DEDUP_TIME_TOLERANCE_SECONDS)
+        merged = df.set_index("ID")
+        if not known_df["ID"].isin(merged.index).all():
+            # 새 action 이 기존 cluster 의 대표가 되거나 두 기존 node 를 이어 붙임 → 기존 node 가 바뀜
+            print("♻️ New actions merge existing nodes → full rebuild")
+            return build_graphs(df, paths, views)
+        known_df = known_df.copy()
+        merged_ids = merged.loc[known_df["ID"], "merged_ids"].tolist()
+        # merged_ids 가 바뀐 기존 action 만 relation store 에 다시 기록
+        previous = known_df["merged_ids"].tolist() if "merged_ids" in known_df.columns else [None] * len(known_df)
+        rows = [key for key, ids, before in zip(known_df.index, merged_ids, previous) if ids != before]
+        known_df["merged_ids"] = merged_ids
+        known_df["dup_count"] = merged.loc[known_df["ID"], "dup_count"].tolist()
+    new_df = df[~df["ID"].isin(known_ids)].reset_index(drop=True)
+
+    new_paths = set(changes["new"])
+    new_files = [f for f in iter_folder_files(paths["store"]) if f.get("filePath") in new_paths]
+    if new_df.empty and not new_files:
+        print("✅ No new actions; graphs are up to date")
+        return graphs
+    if not new_df.empty:
+        n_old = len(known_df)
+        relation, known_df, graphs = add_actions_to_graphs(
+            new_df, known_df, relation, graphs, RST_THRESHOLD, CAUSAL_THRESHOLD, weights=WEIGHTS,
+            max_gap=CAUSAL_MAX_GAP_SECONDS
+        )
+        rows += list(known_df.index[n_old:])
+    add_files_to_graph(graphs["rdf"], new_files, read_folder_info(paths["store"]).get("folderPath"))
+    append_relation_matrix(relation, known_df, paths["relation_dir"], rows)
+    save_graphs(graphs, paths["graph_dir"])
+    if views:
+        emit_views(graphs, paths["output_dir"])
+    return graphs
+
+def watch_pipeline(folders, emit_interval=WATCH_EMIT_SECONDS, polling=False):
+    # 변경된 폴더마다 증분 갱신 (HTML 은 emit_interval 마다 한 번만), 시작 시 한 번 따라잡기
+    paths = {folder: pipeline_paths(os.path.basename(os.path.normpath(folder)) if len(folders) > 1 else None)
+             for folder in folders}
+    graphs = {folder: update_pipeline(folder, paths[folder]) for folder in folders}
+
+    def on_batch(folder, changed_paths):
+        graphs[folder] = update_pipeline(folder, paths[folder], views=False)
+
+    def on_emit(folder):
+        emit_views(graphs[folder], paths[folder]["output_dir"])
+
+    ignore = [os.path.abspath(p[key]) for p in paths.values() for key in ("store", "manifest", "output_dir")]
+    watch_folders(folders, on_batch, on_emit, emit_interval=emit_interval, polling=polling, ignore=ignore)
 
 
 if __name__ == "__main__":
-    input_folder = "scene1(coffee)"
-    output_file = "caren_preprocessed_output.json"
-    main_pipeline(input_folder, output_file)
+    parser = argparse.ArgumentParser(description="CAREN evidence pipeline")
+    parser.add_argument("folders", nargs="*", default=WATCH_FOLDERS, help="evidence folder(s)")
+    parser.add_argument("--watch", action="store_true", help="keep running and apply changes as they arrive")
+    parser.add_argument("--poll", action="store_true", help="use polling instead of filesystem events")
+    parser.add_argument("--emit-interval", type=float, default=WATCH_EMIT_SECONDS, help="seconds between HTML view updates")
+    args = parser.parse_args()
+
+    if args.watch:
+        watch_pipeline(args.folders, emit_interval=args.emit_interval, polling=args.poll)
+    else:
+        for input_folder in args.folders:
+            paths = pipeline_paths(os.path.basename(os.path.normpath(input_folder)) if len(args.folders) > 1 else None)
+            main_pipeline(input_folder, paths["store"], paths)
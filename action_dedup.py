@@ -0,0 +1,98 @@
+import re
+import hashlib
+import numpy as np
+from timestamps import MISSING_EPOCH, add_action_times
+
+# MinHash LSH: 32개 hash 를 4개씩 8 band 로 나눔 → Jaccard 0.8 쌍은 ~98% 확률로 한 band 를 공유,
+# 0.3 이하 쌍은 ~6% 만 후보가 됨. 후보는 실제 토큰 Jaccard 로 다시 확인
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 8
+ROWS_PER_BAND = MINHASH_PERMUTATIONS // MINHASH_BANDS
+TOKEN = re.compile(r"\w+")
+SEEDS = np.random.default_rng(20201201).integers(1, 2 ** 63, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def _tokens(text):
+    return frozenset(TOKEN.findall(str(text or "").lower()))
+
+def _token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+def _mix(x):
+    # splitmix64 finalizer (uint64 overflow 는 의도된 동작)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+def minhash_signature(tokens):
+    if not tokens:
+        return np.zeros(MINHASH_PERMUTATIONS, dtype=np.uint64)
+    hashes = np.array([_token_hash(t) for t in tokens], dtype=np.uint64)
+    return _mix(hashes[None, :] ^ SEEDS[:, None]).min(axis=1)
+
+def jaccard(a, b):
+    # 토큰이 없는 action (빈 값, 구두점만) 은 어떤 action 과도 중복이 아님
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+def near_duplicate_clusters(texts, times, min_jaccard=0.8, time_tolerance_ms=60000, max_neighbors=256):
+    # → 각 action 의 cluster 대표 위치 (union-find). 같은 band 를 공유하는 action 중
+    #   시각 차이가 tolerance 이내(또는 둘 다 시각 없음)이고 토큰 Jaccard 가 min_jaccard 이상인 쌍을 병합
+    n = len(texts)
+    tokens = [_tokens(t) for t in texts]
+    signatures = np.stack([minhash_signature(t) for t in tokens]) if n else np.zeros((0, MINHASH_PERMUTATIONS), np.uint64)
+    parent = list(range(n))
+    times = np.asarray(times, dtype=np.int64)
+    missing = times == MISSING_EPOCH
+    empty = np.array([not t for t in tokens], dtype=bool)
+
+    for band in range(MINHASH_BANDS):
+        rows = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        keys = _mix(np.bitwise_xor.reduce(_mix(rows + np.arange(ROWS_PER_BAND, dtype=np.uint64)), axis=1)).view(np.int64)
+        # band 값 → 시각 없음 여부 → 시각 순으로 정렬해 시간 창 안의 이웃만 비교
+        order = np.lexsort((times, missing, keys))
+        for pos, a in enumerate(order):
+            if empty[a]:
+                continue
+            for b in order[pos + 1:pos + 1 + max_neighbors]:
+                if keys[b] != keys[a] or missing[b] != missing[a]:
+                    break
+                if not missing[a] and times[b] - times[a] > time_tolerance_ms:
+                    break
+                ra, rb = _find(parent, a), _find(parent, b)
+                if ra != rb and jaccard(tokens[a], tokens[b]) >= min_jaccard:
+                    parent[max(ra, rb)] = min(ra, rb)
+    return np.array([_find(parent, x) for x in range(n)], dtype=np.int64)
+
+def collapse_near_duplicates(shard_df, min_jaccard=0.8, time_tolerance_seconds=60):
+    # 거의 같은 action 을 하나의 node 로 합치고, 합쳐진 모든 action ID 를 merged_ids 로 보존
+    if shard_df.empty:
+        return shard_df
+    add_action_times(shard_df)
+    times = shard_df["T_epoch"].to_numpy(np.int64)
+    roots = near_duplicate_clusters(shard_df["A"].tolist(), times, min_jaccard, int(time_tolerance_seconds * 1000))
+
+    # 대표는 cluster 안에서 가장 이른 시각의 action (시각이 같으면 먼저 나온 것)
+    order = np.lexsort((np.arange(len(shard_df)), times, roots))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = roots[order[1:]] != roots[order[:-1]]
+
+    members = {}
+    for root, action_id in zip(roots, shard_df["ID"].tolist()):
+        members.setdefault(root, []).append(action_id)
+
+    keep = np.sort(order[first])
+    result = shard_df.iloc[keep].copy()
+    result["merged_ids"] = [members[roots[pos]] for pos in keep]
+    result["dup_count"] = [len(members[roots[pos]]) for pos in keep]
+    result = result.reset_index(drop=True)
+    print(f"🧬 Near-duplicate collapsing: {len(shard_df)} → {len(result)} actions "
+          f"({int((result['dup_count'] > 1).sum())} merged clusters)")
+    return result
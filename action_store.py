@@ -0,0 +1,147 @@
+import os
+import json
+import pandas as pd
+from timestamps import normalize_action_times, add_action_times
+
+# 한 줄에 레코드 하나 (JSONL):
+#   {"type": "folder", ...}                      첫 줄
+#   {"type": "file", ...파일 필드 (actions 제외)}   파일 헤더
+#   {"type": "action", "fileID": ..., "idx": k, ...}  해당 파일의 action 들
+FILE_PREFIX = '{"type": "file"'
+METADATA_KEYS = ["device_id", "user_id", "address", "card_number", "ip_address"]
+
+def _dump(record):
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+class ActionStoreWriter:
+    def __init__(self, path, folder_info):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.f = open(self.tmp_path, "w", encoding="utf-8")
+        self.f.write(_dump({"type": "folder", **folder_info}))
+        self.files = 0
+        self.actions = 0
+
+    def write_file(self, record):
+        header = {k: v for k, v in record.items() if k != "actions"}
+        self.f.write(_dump({"type": "file", **header}))
+        actions = [a if isinstance(a, dict) else {"action": a} for a in record.get("actions", [])]
+        # 파일 단위로 시각을 한 번에 정규화해 epoch(ms) + 품질 플래그를 함께 저장
+        epochs, quality = normalize_action_times(
+            [a.get("timestamp") for a in actions],
+            [a.get("T_S") or record.get("modifiedTime") for a in actions]
+        )
+        for idx, action in enumerate(actions):
+            fields = {k: v for k, v in action.items() if k not in ("type", "fileID", "idx", "T_epoch", "T_quality")}
+            t_epoch = int(epochs[idx]) if quality[idx] not in ("missing", "invalid") else None
+            self.f.write(_dump({"type": "action", "fileID": record.get("fileID"), "idx": idx, **fields,
+                                "T_epoch": t_epoch, "T_quality": quality[idx]}))
+            self.actions += 1
+        self.files += 1
+        self.f.flush()
+
+    def write_raw(self, lines):
+        # 이전 store 에서 변경 없는 파일 블록을 그대로 복사
+        self.f.writelines(lines)
+        self.files += 1
+
+    def close(self):
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.f.close()
+            os.remove(self.tmp_path)
+
+def iter_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_folder_info(path):
+    with open(path, "r", encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    record.pop("type", None)
+    return record
+
+def iter_file_blocks(path):
+    # (file header, [raw lines]) 단위로 순회 — action 줄은 파싱하지 않음
+    header, lines = None, []
+    with open(path, "r", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            if line.startswith(FILE_PREFIX):
+                if header is not None:
+                    yield header, lines
+                header, lines = json.loads(line), [line]
+            elif header is not None:
+                lines.append(line)
+    if header is not None:
+        yield header, lines
+
+def action_row(file_header, action):
+    meta = file_header.get("metadata") or {}
+    return {
+        "A": action.get("action"),
+        "T_A": action.get("timestamp"),
+        "T_S": action.get("T_S") or file_header.get("modifiedTime"),
+        "ID": f"{file_header.get('fileID')}_{action.get('idx')}",
+        "C": action.get("context"),
+        "M": json.dumps({k: meta.get(k) for k in METADATA_KEYS}, ensure_ascii=False),
+        "T_epoch": action.get("T_epoch"),
+        "T_quality": action.get("T_quality")
+    }
+
+def iter_action_chunks(path, chunksize=10000):
+    file_header, rows = {}, []
+    for record in iter_records(path):
+        kind = record.get("type")
+        if kind == "file":
+            file_header = record
+        elif kind == "action" and record.get("action"):
+            rows.append(action_row(file_header, record))
+            if len(rows) >= chunksize:
+                yield add_action_times(pd.DataFrame(rows))
+                rows = []
+    if rows:
+        yield add_action_times(pd.DataFrame(rows))
+
+def load_actions(path, chunksize=10000):
+    chunks = list(iter_action_chunks(path, chunksize))
+    if not chunks:
+        return pd.DataFrame(columns=["A", "T_A", "T_S", "ID", "C", "M", "T_epoch", "T_quality"])
+    return pd.concat(chunks, ignore_index=True)
+
+def iter_folder_files(path):
+    # 기존 JSON 출력 구조의 file dict (actions 포함) 를 파일 하나씩 복원 (RDF 그래프, JSON export 용)
+    file = None
+    for record in iter_records(path):
+        kind = record.pop("type", None)
+        if kind == "file":
+            if file is not None:
+                yield file
+            file = dict(record, actions=[])
+        elif kind == "action" and file is not None:
+            for key in ("fileID", "idx", "T_epoch", "T_quality"):
+                record.pop(key, None)
+            file["actions"].append(record)
+    if file is not None:
+        yield file
+
+def export_json(store_path, json_path):
+    # 기존 preprocessed JSON 과 같은 구조 ({..., "files": [...]}) 를 파일 단위로 이어 씀
+    folder = read_folder_info(store_path)
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(folder, indent=2, ensure_ascii=False)[:-2] + ',\n  "files": [')
+        for k, file in enumerate(iter_folder_files(store_path)):
+            text = json.dumps(file, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+            f.write(("," if k else "") + "\n    " + text)
+        f.write("\n  ]\n}")
+    print(f"📝 JSON export saved to: {json_path}")
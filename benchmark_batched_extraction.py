@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+
+# row 별 요청 vs 묶음 요청 비교: 요청 수, 토큰 사용량, 소요 시간, 추출 결과 일치율
+# 사용: python benchmark_batched_extraction.py evidence.csv --batch-rows 20
+#       python benchmark_batched_extraction.py --mock --rows 500   (오프라인, mock 서버 사용)
+
+def token_jaccard(a, b):
+    set_a, set_b = set(str(a or "").lower().split()), set(str(b or "").lower().split())
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+def run_mode(fp, texts, batch_rows, token_budget):
+    before = dict(fp.llm_scheduler.stats())
+    start = time.time()
+    shards = fp.extract_row_shards_from_gpt(texts, batch_rows=batch_rows, token_budget=token_budget)
+    elapsed = time.time() - start
+    after = fp.llm_scheduler.stats()
+    return shards, {
+        "requests": after["requests"] - before["requests"],
+        "prompt_tokens": after["prompt_tokens"] - before["prompt_tokens"],
+        "completion_tokens": after["completion_tokens"] - before["completion_tokens"],
+        "seconds": round(elapsed, 2),
+        "rows_extracted": sum(1 for s in shards if isinstance(s, dict) and s.get("A"))
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?")
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--batch-rows", type=int, default=20)
+    parser.add_argument("--token-budget", type=int, default=6000)
+    parser.add_argument("--mock", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if args.mock:
+        from mock_openai_server import start_mock_server
+        server = start_mock_server(port=0, latency=args.latency)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    # 캐시를 끄고 두 모드 모두 실제 요청을 보내도록 함
+    import config
+    config.LLM_CACHE_PATH = None
+    import file_parser as fp
+    from llm_scheduler import RateLimiter
+    from io import StringIO
+    from contextlib import redirect_stdout
+
+    if args.mock:
+        # mock 서버에는 계정 rate limit 이 없으므로 limiter 를 끔
+        fp.llm_scheduler.limiter = RateLimiter()
+
+    if args.csv:
+        df = pd.read_csv(args.csv).head(args.rows)
+    else:
+        df = pd.DataFrame({
+            "user": [f"user{i % 17}" for i in range(args.rows)],
+            "event": [f"opened document report_{i}.docx" for i in range(args.rows)],
+            "ts": [f"2020-12-{1 + i % 28:02d} {i % 24:02d}:15:00" for i in range(args.rows)]
+        })
+    texts = [fp.row_to_text(row) for _, row in df.iterrows()]
+
+    with redirect_stdout(StringIO()):
+        row_shards, row_stats = run_mode(fp, texts, 1, args.token_budget)
+        batch_shards, batch_stats = run_mode(fp, texts, args.batch_rows, args.token_budget)
+
+    pairs = [(r, b) for r, b in zip(row_shards, batch_shards) if isinstance(r, dict) and isinstance(b, dict)]
+    action_agreement = sum(token_jaccard(r.get("A"), b.get("A")) >= 0.5 for r, b in pairs) / max(len(pairs), 1)
+    time_agreement = sum(str(r.get("T_A")) == str(b.get("T_A")) for r, b in pairs) / max(len(pairs), 1)
+
+    print(f"📊 rows: {len(texts)}")
+    print(f"   per-row : {row_stats}")
+    print(f"   batched : {batch_stats} (batch_rows={args.batch_rows})")
+    if batch_stats["requests"]:
+        print(f"   request reduction: {row_stats['requests'] / batch_stats['requests']:.1f}x, "
+              f"prompt token reduction: {row_stats['prompt_tokens'] / max(batch_stats['prompt_tokens'], 1):.1f}x")
+    print(f"   agreement: action {action_agreement:.3f}, timestamp {time_agreement:.3f} over {len(pairs)} rows")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,69 @@
-import networkx as nx
+import numpy as np
+from scipy import sparse
+from relation_matrix import COMPONENTS, lookup_components
+from graph_core import ArrayGraph, as_array_graph
 
-def build_combined_graph(rst_graph, causal_graph):
-    combined = nx.DiGraph()
+def build_combined_graph(rst_graph, causal_graph, relation=None):
+    # RST 와 causal 인접행렬의 sparse 합으로 병합 → ArrayGraph (방향)
+    # 합의 값 1 = rst, 2 = causal, 3 = 같은 쌍에 둘 다 ("both")
+    rst, causal = as_array_graph(rst_graph), as_array_graph(causal_graph)
 
-    # Add all nodes from RST graph
-    for node, data in rst_graph.nodes(data=True):
-        combined.add_node(node, label=data.get("A", str(node)))
+    # node 는 RST graph 의 node + RST 에 없는 causal 엣지 끝점
+    node_keys = list(rst.node_keys)
+    position = {node: k for k, node in enumerate(node_keys)}
+    cs, cd = causal.edge_arrays()
+    for k in np.unique(np.concatenate([cs, cd])).tolist():
+        key = causal.node_keys[k]
+        if key not in position:
+            position[key] = len(node_keys)
+            node_keys.append(key)
+    causal_pos = np.array([position.get(key, -1) for key in causal.node_keys], dtype=np.int64)
+    cs, cd = causal_pos[cs], causal_pos[cd]
+    rs, rd = rst.edge_arrays()
 
-    # Add RST edges (only if they exist)
-    for u, v, data in rst_graph.edges(data=True):
-        if u < v:
-            combined.add_edge(u, v, type="rst", weight=data.get("weight", 0))
+    # RST 는 무방향: 같은 쌍에 causal 엣지가 어느 방향이든 있으면 causal 방향의 "both" 엣지 하나로 합침
+    # (node 위치 순서와 무관하므로 증분 갱신과 전체 재구성의 분류가 같음). RST 만 있는 엣지는 낮은 위치 → 높은 위치
+    n = len(node_keys)
+    rst_m = sparse.csr_matrix((np.ones(len(rs), dtype=np.int8), (rs, rd)), shape=(n, n))
+    causal_m = sparse.csr_matrix((np.ones(len(cs), dtype=np.int8), (cs, cd)), shape=(n, n))
+    rst_only = rst_m - rst_m.multiply(causal_m) - rst_m.multiply(causal_m.T)
+    codes = (rst_only + 2 * causal_m + causal_m.multiply(rst_m + rst_m.T)).tocsr()
+    codes.eliminate_zeros()
+    codes.sort_indices()
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(codes.indptr))
+    dst = codes.indices.astype(np.int64)
+    types = (codes.data - 1).astype(np.int8)
 
-    # Add Causal edges with strict existence check
-    for u, v, data in causal_graph.edges(data=True):
-        if causal_graph.has_edge(u, v):  # Enforce causal edge validation
-            if combined.has_edge(u, v):
-                combined[u][v]["type"] = "both"
-                combined[u][v]["causal_weight"] = data.get("weight", 0)
-            else:
-                combined.add_edge(u, v, type="causal", causal_weight=data.get("weight", 0))
+    # RST weight 는 무방향 쌍 키 (낮은 위치 * n + 높은 위치) 로 찾음 — 엣지가 하나도 없어도 빈 배열로 동작
+    rst_keys = np.minimum(rs, rd) * n + np.maximum(rs, rd)
+    order = np.argsort(rst_keys, kind="stable")
+    weight = np.full(len(src), np.nan, dtype=np.float32)
+    has_rst = codes.data != 2
+    pair_keys = np.minimum(src, dst)[has_rst] * n + np.maximum(src, dst)[has_rst]
+    weight[has_rst] = rst.edge_attrs.get("weight", np.empty(0, dtype=np.float32))[order[np.searchsorted(rst_keys[order], pair_keys)]]
+    # causal 엣지는 방향이 그대로 남으므로 엣지 키 (src * n + dst) 로 위치를 찾음
+    keys = src * n + dst
+    causal_weight = np.full(len(keys), np.nan, dtype=np.float32)
+    causal_weight[np.searchsorted(keys, cs * n + cd)] = causal.edge_attrs.get("weight", np.empty(0, dtype=np.float32))
 
-    return combined
+    edge_attrs = {"type": types, "weight": weight, "causal_weight": causal_weight}
+    if relation is not None:
+        edge_attrs.update(component_arrays(relation, node_keys, src, dst))
+    labels = rst.node_attrs.get("A", [None] * rst.number_of_nodes())
+    return ArrayGraph.from_edges(node_keys, src, dst, edge_attrs,
+                                 node_attrs={"label": list(labels) + [None] * (n - len(labels))})
 
+def component_arrays(relation, node_keys, src, dst):
+    # 공유 relation matrix 의 성분 점수 (RST/causal 과 동일한 값), 없는 쌍은 NaN
+    position = {node: k for k, node in enumerate(relation["index"])}
+    rel_pos = np.array([position.get(key, -1) for key in node_keys], dtype=np.int64)
+    a, b = rel_pos[src], rel_pos[dst]
+    known = (a >= 0) & (b >= 0)
+    components, found = lookup_components(relation, a[known], b[known])
+    found_idx = np.flatnonzero(known)[found]
+    arrays = {}
+    for name in COMPONENTS:
+        values = np.full(len(src), np.nan, dtype=np.float32)
+        values[found_idx] = np.round(components[name][found].astype(np.float64), 3)
+        arrays[name] = values
+    return arrays
@@ -1,9 +1,10 @@
+import numpy as np
 import networkx as nx
-from sentence_transformers import SentenceTransformer
+from scipy import sparse
 from networkx.algorithms.community import greedy_modularity_communities
-from relation_score_utils import compute_relation_components, compute_rst_score
-
-model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+from relation_score_utils import compute_rst_score
+from relation_matrix import build_relation_matrix, iter_relation_chunks
+from graph_core import ArrayGraph, EDGE_TYPES
 
 def add_clustering_groups(G):
     communities = list(greedy_modularity_communities(G))
@@ -12,36 +13,87 @@ def add_clustering_groups(G):
             G.nodes[node]['group'] = i
     print(f"✅ {len(communities)} communities detected")
 
-def build_rst_graph(shard_df, threshold=0.1):
-    G = nx.Graph()
+def assign_array_groups(G):
+    # ArrayGraph 에 add_clustering_groups 와 같은 community 번호를 node 속성 "group" 으로 기록
+    H = nx.DiGraph() if G.is_directed() else nx.Graph()
+    H.add_nodes_from(range(G.number_of_nodes()))
+    H.add_edges_from(zip(*(a.tolist() for a in G.edge_arrays())))
+    add_clustering_groups(H)
+    G.node_attrs["group"] = [group for _, group in H.nodes(data="group")]
+    return G
+
+def assign_local_groups(G, nodes):
+    # 새 node 만 이웃들의 group 중 가중치 합이 가장 큰 group 에 배정 (이웃이 없으면 새 group)
+    # 기존 node 의 group 은 그대로 두므로 전체 community 재계산 없이 갱신됨 (ArrayGraph, 방향 무시)
+    n = G.number_of_nodes()
+    groups = list(G.node_attrs["group"])
+    position = {node: k for k, node in enumerate(G.node_keys)}
+    src, dst = G.edge_arrays()
+    weight = G.edge_attrs.get("weight", np.full(len(src), np.nan, dtype=np.float32))
+    if "causal_weight" in G.edge_attrs:
+        weight = np.where(np.isnan(weight), G.edge_attrs["causal_weight"], weight)
+    weight = np.where(np.isnan(weight), 1.0, weight)
+    neighbors = sparse.csr_matrix((np.concatenate([weight, weight]), (np.concatenate([src, dst]), np.concatenate([dst, src]))),
+                                  shape=(n, n))
+
+    next_group = max((g for g in groups if g is not None), default=-1) + 1
+    for node in nodes:
+        k = position[node]
+        votes = {}
+        row = slice(neighbors.indptr[k], neighbors.indptr[k + 1])
+        for nbr, w in zip(neighbors.indices[row].tolist(), neighbors.data[row].tolist()):
+            if groups[nbr] is not None:
+                votes[groups[nbr]] = votes.get(groups[nbr], 0.0) + w
+        if votes:
+            groups[k] = max(votes, key=votes.get)
+        else:
+            groups[k] = next_group
+            next_group += 1
+    G.node_attrs["group"] = groups
+    return G
 
-    for i, shard_i in shard_df.iterrows():
-        action_i = shard_i.get("A")
+def build_rst_graph(shard_df, threshold=0.1, relation=None, weights=None):
+    # → ArrayGraph (무방향). networkx 가 필요하면 .to_networkx()
+    if shard_df.empty:
+        return ArrayGraph.from_edges([], [], [], directed=False)
+    index = list(shard_df.index)
+
+    valid, labels = [], []
+    for i, action_i in zip(index, shard_df["A"].tolist()):
         if not isinstance(action_i, str) or not action_i.strip():
             print(f"⚠️ Skipping node {i} due to missing or empty 'A' field")
+            valid.append(False)
             continue
-
-        G.add_node(i, label=action_i.strip(), A=action_i.strip())
-
-        for j, shard_j in shard_df.iterrows():
-            if i >= j:
-                continue
-
-            action_j = shard_j.get("A")
-            if not isinstance(action_j, str) or not action_j.strip():
-                continue
-
-            f_I, f_S, f_C, f_M = compute_relation_components(shard_i, shard_j, model)
-            strength = compute_rst_score(f_I, f_S, f_C, f_M)
-
-            if strength > threshold:
-                G.add_edge(i, j, weight=round(strength, 2), type="rst")
-
-    return G
+        labels.append(action_i.strip())
+        valid.append(True)
+    valid = np.asarray(valid, dtype=bool)
+
+    if relation is None:
+        relation = build_relation_matrix(shard_df)
+    # relation 위치 → graph node 위치 (A 가 없는 action 은 node 에서 제외)
+    node_pos = np.cumsum(valid) - 1
+    src, dst, weight = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.float32)]
+    for _, pi, pj, comp in iter_relation_chunks(relation):
+        strength = compute_rst_score(comp["f_I"], comp["f_S"], comp["f_C"], comp["f_M"], weights)
+        mask = valid[pi] & valid[pj] & (strength > threshold)
+        src.append(node_pos[pi[mask]])
+        dst.append(node_pos[pj[mask]])
+        weight.append(strength[mask])
+    weight = np.concatenate(weight)
+
+    return ArrayGraph.from_edges(
+        [i for i, ok in zip(index, valid) if ok], np.concatenate(src), np.concatenate(dst),
+        edge_attrs={"weight": np.round(weight.astype(np.float64), 2).astype(np.float32),
+                    "type": np.full(len(weight), EDGE_TYPES.index("rst"), dtype=np.int8)},
+        node_attrs={"label": labels, "A": labels}, directed=False
+    )
 
 def draw_graph(G):
     import matplotlib.pyplot as plt
 
+    if isinstance(G, ArrayGraph):
+        G = G.to_networkx()
+
     pos = nx.spring_layout(G, seed=42, k=20)
     plt.figure(figsize=(18, 12))
 
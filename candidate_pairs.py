@@ -0,0 +1,128 @@
+import numpy as np
+from relation_matrix import score_pairs, identity_pairs
+from metadata_similarity import metadata_keys
+from relation_score_utils import compute_rst_score, compute_csim_score
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+DEFAULT_RST_WEIGHTS = {"I": 0.05, "C": 0.3, "S": 0.25, "M": 0.1}
+
+def _pair_keys(i, j, n):
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    keep = i != j
+    return np.unique(np.minimum(i, j)[keep] * n + np.maximum(i, j)[keep])
+
+def _ann_vectors(features, rst_weights=None):
+    # 내적 = wS * f_S + wC * f_C → RST 점수의 의미 부분과 같은 순위
+    w = rst_weights or DEFAULT_RST_WEIGHTS
+    return np.hstack([np.sqrt(w["S"]) * features["A"], np.sqrt(w["C"]) * features["C"]]).astype(np.float32)
+
+def knn_pairs(vectors, k=50, block=None):
+    n = len(vectors)
+    k = min(k, n - 1)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    active = np.flatnonzero(np.linalg.norm(vectors, axis=1) > 0)
+
+    if faiss is not None:
+        index = faiss.IndexHNSWFlat(vectors.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+        index.add(np.ascontiguousarray(vectors[active]))
+        _, nbrs = index.search(np.ascontiguousarray(vectors[active]), k + 1)
+        rows = np.repeat(active, nbrs.shape[1])
+        cols = nbrs.ravel()
+        valid = cols >= 0
+        return rows[valid], active[cols[valid]]
+
+    # exact k-NN fallback (행 블록 단위 행렬곱)
+    rows, cols = [], []
+    sub = vectors[active]
+    kk = min(k, len(active) - 1)
+    if kk <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # 블록 행렬 (block × active) 이 약 2^24 원소 (float32 64MB) 를 넘지 않도록 action 수에 맞춤
+    block = block or max(1, min(1024, (1 << 24) // len(active)))
+    for r0 in range(0, len(active), block):
+        sims = sub[r0:r0 + block] @ sub.T
+        sims[np.arange(len(sims)), np.arange(r0, r0 + len(sims))] = -np.inf
+        top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+        rows.append(np.repeat(active[r0:r0 + len(sims)], kk))
+        cols.append(active[top.ravel()])
+    return np.concatenate(rows), np.concatenate(cols)
+
+def _metadata_keys(value):
+    # f_M 의 exact-match index 와 같은 정규화 값 (IP 는 주소와 subnet)
+    return [f"{field}={v}" for field, values in metadata_keys(value).items() for v in values]
+
+def blocking_pairs(shard_df, max_block=500):
+    # ID 토큰 blocking 은 identity_pairs (f_I postings) 가 담당
+    blocks = {}
+    metas = shard_df["M"].tolist() if "M" in shard_df.columns else []
+    for pos, value in enumerate(metas):
+        for key in _metadata_keys(value):
+            blocks.setdefault(f"meta:{key}", []).append(pos)
+
+    rows, cols = [], []
+    skipped = 0
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            # 너무 흔한 키는 블로킹 효과가 없으므로 건너뜀
+            skipped += 1
+            continue
+        m = np.asarray(members, dtype=np.int64)
+        a, b = np.triu_indices(len(m), k=1)
+        rows.append(m[a])
+        cols.append(m[b])
+    if skipped:
+        print(f"⚠️ Blocking: skipped {skipped} keys shared by more than {max_block} actions")
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+def generate_candidate_pairs(features, shard_df, k=50, max_block=500, rst_weights=None):
+    n = len(features["index"])
+    ki, kj = knn_pairs(_ann_vectors(features, rst_weights), k)
+    bi, bj = blocking_pairs(shard_df, max_block)
+    ii, ij = identity_pairs(features, max_postings=max_block)
+    keys = np.union1d(np.union1d(_pair_keys(ki, kj, n), _pair_keys(bi, bj, n)), _pair_keys(ii, ij, n))
+    total = n * (n - 1) // 2
+    print(f"🧲 Candidate pairs: {len(keys)} of {total} ({'faiss' if faiss is not None else 'exact k-NN'}, k={k})")
+    return keys // n, keys % n
+
+def estimate_candidate_recall(features, pairs, rst_threshold, causal_threshold, weights=None,
+                              rst_weights=None, sample_size=200, seed=42):
+    # 샘플 행에 대해 전체 쌍을 점수화하고, 임계값을 넘는 쌍 중 후보에 포함된 비율을 계산
+    n = len(features["index"])
+    if n < 2:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(n, size=min(sample_size, n), replace=False)
+
+    step = max(1, 2000000 // n)
+    true_parts = []
+    for s0 in range(0, len(sample), step):
+        rows = sample[s0:s0 + step]
+        i = np.repeat(rows, n)
+        j = np.tile(np.arange(n), len(rows))
+        keep = i != j
+        i, j = i[keep], j[keep]
+
+        comp = score_pairs(features, i, j)
+        rst = compute_rst_score(comp["f_I"], comp["f_S"], comp["f_C"], comp["f_M"], rst_weights)
+        csim = compute_csim_score(comp["f_I"], comp["f_S"], comp["f_C"], comp["f_M"], rst, weights)
+        relevant = (rst > rst_threshold) | (csim >= causal_threshold)
+        true_parts.append(_pair_keys(i[relevant], j[relevant], n))
+
+    true_keys = np.unique(np.concatenate(true_parts))
+    if not len(true_keys):
+        print("📏 Candidate recall: no pairs above threshold in sample")
+        return 1.0
+    cand_keys = _pair_keys(pairs[0], pairs[1], n)
+    recall = float(np.isin(true_keys, cand_keys).mean())
+    print(f"📏 Candidate recall: {recall:.3f} ({len(true_keys)} relevant pairs from {len(sample)} sampled actions)")
+    return recall
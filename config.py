@@ -1,6 +1,16 @@
+import os
+
 # Thresholds for edge creation
-RST_THRESHOLD = 0.3
-CAUSAL_THRESHOLD = 0.27
+# 구조적 f_M 은 공유 값이 없으면 0 (이전 JSON 임베딩 cosine 은 거의 모든 쌍에서 ~0.5-1)
+# → 그만큼 빠진 기본 점수를 반영해 0.3 / 0.27 에서 낮춤
+RST_THRESHOLD = 0.22
+CAUSAL_THRESHOLD = 0.13
+
+# Maximum time gap (seconds) between cause and effect; None = no window
+CAUSAL_MAX_GAP_SECONDS = None
+
+# Timezone policy: timezone 정보가 없는 시각을 이 timezone 의 현지 시각으로 해석 (예: "Asia/Seoul")
+NAIVE_TIMEZONE = "UTC"
 
 # Weights for similarity components in causal inference
 WEIGHTS = {
@@ -11,6 +21,105 @@ WEIGHTS = {
     "rst": 0.05
 }
 
+# Sentence embedding model and persistent embedding cache (None 이면 캐시 비활성화)
+EMBEDDING_MODEL = "paraphrase-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = "cache/embeddings"
+EMBEDDING_CACHE_MAX_MB = 512
+
+# Structured metadata similarity f_M (필드별 가중치 합 = 1). ip 는 같은 subnet 이면 IP_SUBNET_SIMILARITY 만큼,
+# address 는 문자 trigram Jaccard 가 ADDRESS_MIN_SIMILARITY 이상일 때만 반영
+METADATA_FIELD_WEIGHTS = {
+    "device_id": 0.25,
+    "user_id": 0.25,
+    "card_number": 0.2,
+    "ip_address": 0.2,
+    "address": 0.1
+}
+IP_SUBNET_SIMILARITY = 0.5
+ADDRESS_MIN_SIMILARITY = 0.5
+
+# Near-duplicate collapsing before graph construction (MinHash LSH 토큰 Jaccard + 시각 허용 오차)
+DEDUP_ENABLED = True
+DEDUP_MIN_JACCARD = 0.8
+DEDUP_TIME_TOLERANCE_SECONDS = 60
+
 # Output paths
 OUTPUT_FOLDER = "outputs"
 
+# Watch mode (python CAREN.py --watch): 변경이 debounce 초 동안 잠잠해지면 (최대 max_delay 초 후) 증분 갱신,
+# HTML view 는 WATCH_EMIT_SECONDS 마다. watchdog 이 없으면 WATCH_POLL_SECONDS 간격 polling
+WATCH_FOLDERS = ["scene1(coffee)"]
+WATCH_DEBOUNCE_SECONDS = 2.0
+WATCH_MAX_DELAY_SECONDS = 10.0
+WATCH_POLL_SECONDS = 1.0
+WATCH_EMIT_SECONDS = 5.0
+WATCH_METRICS_PATH = "outputs/watch_metrics.json"
+
+# Saved RST/causal/combined (ArrayGraph .npz) and RDF (node-link JSON) graphs for incremental updates (CAREN.update_pipeline)
+GRAPH_STORE_DIR = "outputs/graphs"
+# 전체 재구성 때 RST/combined 그래프에 community "group" node 속성 계산 (큰 그래프에서 느림 → 기본 끔)
+GRAPH_COMMUNITY_GROUPS = False
+
+# Saved f_I/f_S/f_C/f_M pair scores for threshold/weight sweeps
+RELATION_STORE_DIR = "outputs/relation"
+RELATION_STORE_DTYPE = "float16"
+
+# Candidate-pair blocking (k-NN over action/context embeddings + exact ID/metadata keys)
+CANDIDATE_MODE = False
+CANDIDATE_TOP_K = 50
+CANDIDATE_MAX_BLOCK = 500
+CANDIDATE_RECALL_SAMPLE = 200
+
+# LLM extraction and response cache (LLM_REPLAY_ONLY = True 이면 네트워크 호출 없이 캐시만 사용)
+LLM_MODEL = "gpt-4o"
+LLM_CACHE_PATH = "cache/llm_responses.sqlite"
+LLM_CACHE_MAX_ENTRIES = 200000
+LLM_REPLAY_ONLY = False
+
+# Concurrent LLM requests with rate limits (None = 제한 없음) and retry/backoff
+# 제한은 Python 프로세스 하나 기준 (프로세스마다 scheduler 가 따로 있음) → 여러 CAREN 프로세스를 동시에 돌리면 나눠서 설정
+LLM_CONCURRENCY = 8
+LLM_REQUESTS_PER_MINUTE = 500
+LLM_TOKENS_PER_MINUTE = 30000
+LLM_MAX_RETRIES = 5
+
+# Rows packed into one LLM request for CSV/Excel/SQLite (1 = row 별 요청)
+LLM_BATCH_ROWS = 20
+LLM_BATCH_TOKEN_BUDGET = 6000
+
+# Size caps: 텍스트 파일은 앞 FILE_MAX_READ_BYTES 만 읽고, LLM 에는 LLM_MAX_CONTENT_CHARS 까지만 보냄
+FILE_MAX_READ_BYTES = 16 * 1024 * 1024
+LLM_MAX_CONTENT_CHARS = 24000
+
+# CSV/Excel: 시트별로 TABLE_CHUNK_ROWS 개씩 스트리밍 (Excel 은 openpyxl read-only 모드)
+TABLE_CHUNK_ROWS = 500
+
+# Large text/JSON/XML/HTML: 토큰 예산 단위로 겹치게 나눠 청크별로 추출 (None = 청크 수 제한 없음)
+CHUNK_TOKEN_BUDGET = 3000
+CHUNK_OVERLAP_TOKENS = 200
+CHUNK_MAX_PER_FILE = 200
+
+# Mail: mbox 는 메시지 단위로 스트리밍해 EMAIL_CHUNK_MESSAGES 개씩 묶어 추출, 첨부는 해시만 기록 (None = 제한 없음)
+EMAIL_CHUNK_MESSAGES = 200
+EMAIL_MAX_BODY_CHARS = 4000
+EMAIL_MAX_MESSAGES = None
+
+# 규칙 기반 추출기(metadata_rules.py)가 찾지 못했을 때 LLM 에 요청할 메타데이터 필드
+# 기본값은 전체 5개 키; 규칙으로 충분히 잡히는 필드(device_id, card_number, ip_address 등)는 빼서 요청 수를 줄일 수 있음 ([] = 규칙만 사용)
+METADATA_LLM_FALLBACK_FIELDS = ["device_id", "user_id", "address", "card_number", "ip_address"]
+
+# Folder ingestion: 파일을 병렬로 파싱하는 thread 수 (LLM 요청은 위 scheduler 하나를 공유)
+INGEST_WORKERS = os.cpu_count() or 4
+INGEST_MANIFEST_PATH = "caren_manifest.json"
+
+# Action store (JSONL, 파일 파싱이 끝나는 대로 기록). 기존 JSON 형식 export 는 선택 (예: "caren_preprocessed_output.json", None = 생략)
+ACTION_STORE_PATH = "caren_actions.jsonl"
+ACTION_JSON_EXPORT_PATH = None
+ACTION_LOAD_CHUNK_ROWS = 10000
+
+# Streaming SQLite ingestion (None = 제한 없음)
+SQLITE_CHUNK_ROWS = 500
+SQLITE_MAX_ROWS_PER_TABLE = None
+SQLITE_INCLUDE_TABLES = None
+SQLITE_EXCLUDE_TABLES = ["sqlite_sequence", "sqlite_stat1", "sqlite_stat4"]
+SQLITE_MAX_VALUE_CHARS = 256
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import hashlib
+import itertools
+import sqlite3
+import numpy as np
+from config import EMBEDDING_MODEL, EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_MAX_MB
+
+_open_caches = {}
+
+def text_hash(text):
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    # SQLite 인덱스 (model, sha256) → slot, 벡터는 모델별 memmap float32 파일에 저장
+    def __init__(self, cache_dir, model_name, dim, max_bytes=512 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max(1, int(max_bytes // (dim * 4)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_lru ON embeddings (model, last_used)")
+        self.conn.commit()
+
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.vector_path = os.path.join(cache_dir, f"{safe_name}.{dim}.f32")
+        self.vectors = self._open_vectors()
+
+    def _open_vectors(self, capacity=0):
+        # 파일은 필요할 때마다 두 배씩 늘림 (max_entries 만큼 미리 잡지 않음)
+        row_bytes = self.dim * 4
+        existing = os.path.getsize(self.vector_path) // row_bytes if os.path.exists(self.vector_path) else 0
+        capacity = max(existing, capacity, min(self.max_entries, 1024))
+        if existing < capacity:
+            with open(self.vector_path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        return np.memmap(self.vector_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)).fetchone()[0]
+
+    def get_many(self, texts):
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        now = time.time()
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT hash, slot FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                [self.model_name, *chunk]
+            ).fetchall()
+            found.update(rows)
+        if found:
+            self.conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                [(now, self.model_name, h) for h in found]
+            )
+            self.conn.commit()
+
+        result = {}
+        for t, h in zip(texts, hashes):
+            if h in found:
+                result[t] = np.array(self.vectors[found[h]])
+        self.hits += len(result)
+        self.misses += len(texts) - len(result)
+        return result
+
+    def put_many(self, texts, vecs):
+        now = time.time()
+        used = {r[0] for r in self.conn.execute("SELECT slot FROM embeddings WHERE model = ?", (self.model_name,))}
+        free_slots = (s for s in itertools.count() if s not in used)
+
+        for t, vec in zip(texts, vecs):
+            h = text_hash(t)
+            row = self.conn.execute(
+                "SELECT slot FROM embeddings WHERE model = ? AND hash = ?", (self.model_name, h)
+            ).fetchone()
+            if row:
+                slot = row[0]
+            elif len(used) < self.max_entries:
+                slot = next(free_slots)
+                used.add(slot)
+                if slot >= len(self.vectors):
+                    self.vectors.flush()
+                    self.vectors = self._open_vectors(min(len(self.vectors) * 2, max(self.max_entries, slot + 1)))
+            else:
+                # LRU 항목 제거 후 해당 slot 재사용
+                slot, old_hash = self.conn.execute(
+                    "SELECT slot, hash FROM embeddings WHERE model = ? ORDER BY last_used LIMIT 1",
+                    (self.model_name,)
+                ).fetchone()
+                self.conn.execute("DELETE FROM embeddings WHERE model = ? AND hash = ?", (self.model_name, old_hash))
+                self.evictions += 1
+            self.vectors[slot] = np.asarray(vec, dtype=np.float32)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings (model, hash, slot, last_used) VALUES (?, ?, ?, ?)",
+                (self.model_name, h, slot, now)
+            )
+        self.vectors.flush()
+        self.conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        self.vectors.flush()
+        self.conn.close()
+
+def open_embedding_cache(cache_dir, model_name, dim, max_bytes=512 * 1024 * 1024):
+    key = (os.path.abspath(cache_dir), model_name, dim)
+    if key not in _open_caches:
+        _open_caches[key] = EmbeddingCache(cache_dir, model_name, dim, max_bytes)
+    return _open_caches[key]
+
+def default_embedding_cache(model, model_name=EMBEDDING_MODEL):
+    if not EMBEDDING_CACHE_DIR:
+        return None
+    return open_embedding_cache(
+        EMBEDDING_CACHE_DIR, model_name, model.get_sentence_embedding_dimension(),
+        EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+    )
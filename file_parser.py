@@ -1,19 +1,106 @@
 
 import os
+import codecs
 import json
 import re
-import email
+import time
+import hashlib
 import pandas as pd
+from itertools import islice
 import sqlite3
-from bs4 import BeautifulSoup
+from pathlib import Path
+from html.parser import HTMLParser as StdHTMLParser
 from datetime import datetime
 from dateutil.parser import parse as date_parse
 import xml.etree.ElementTree as ET
 from openai import OpenAI
 from email.header import decode_header
+from email.parser import BytesParser
+from email.policy import compat32
+from email.utils import parsedate_to_datetime
+from llm_cache import LLMCache, ReplayMiss, content_hash
+from llm_scheduler import ExtractionScheduler, estimate_tokens
+from config import LLM_MODEL, LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_REPLAY_ONLY
+from config import LLM_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES
+from config import LLM_BATCH_ROWS, LLM_BATCH_TOKEN_BUDGET, LLM_MAX_CONTENT_CHARS, FILE_MAX_READ_BYTES, METADATA_LLM_FALLBACK_FIELDS
+from config import TABLE_CHUNK_ROWS
+from config import EMAIL_CHUNK_MESSAGES, EMAIL_MAX_BODY_CHARS, EMAIL_MAX_MESSAGES
+from config import CHUNK_TOKEN_BUDGET, CHUNK_OVERLAP_TOKENS, CHUNK_MAX_PER_FILE
+from config import SQLITE_CHUNK_ROWS, SQLITE_MAX_ROWS_PER_TABLE, SQLITE_INCLUDE_TABLES, SQLITE_EXCLUDE_TABLES, SQLITE_MAX_VALUE_CHARS
+from sqlite_schemas import get_sqlite_schema, get_table_spec, convert_timestamp
+from metadata_rules import MetadataRuleScanner
 
+# 선택적 고속 백엔드: 없으면 표준 라이브러리 / pandas 로 대체
+try:
+    from selectolax.parser import HTMLParser as FastHTMLParser
+except ImportError:
+    FastHTMLParser = None
 
-client  = OpenAI(api_key = "")
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+# OPENAI_BASE_URL 로 로컬 OpenAI 호환 서버(mock_openai_server.py 등)를 지정할 수 있음
+# 재시도는 llm_scheduler 가 담당하므로 SDK 자체 재시도는 끔
+client  = OpenAI(api_key = os.environ.get("OPENAI_API_KEY", ""), base_url = os.environ.get("OPENAI_BASE_URL") or None, max_retries = 0)
+llm_cache = LLMCache(LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES, LLM_REPLAY_ONLY) if LLM_CACHE_PATH else None
+llm_scheduler = ExtractionScheduler(
+    concurrency=LLM_CONCURRENCY,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_retries=LLM_MAX_RETRIES
+)
+
+# 프롬프트/파라미터를 바꾸면 버전을 올려서 이전 캐시 응답과 섞이지 않게 함
+SHARD_PROMPT_VERSION = "shard-v1"
+BATCH_PROMPT_VERSION = "batch-shard-v1"
+METADATA_PROMPT_VERSION = "metadata-v1"
+COMBINED_PROMPT_VERSION = "shard-metadata-v1"
+
+METADATA_KEYS = ["device_id", "user_id", "address", "card_number", "ip_address"]
+
+def call_gpt(system_prompt, prompt, content, template_version, temperature, max_tokens):
+    if llm_cache is not None:
+        cached = llm_cache.get(LLM_MODEL, template_version, temperature, content)
+        # 파싱되지 않는 항목은 캐시 미스로 보고 다시 요청
+        if cached is not None and parses_as_json(cached):
+            return cached
+        if llm_cache.replay_only:
+            raise ReplayMiss(f"no cached {template_version} response for content {content_hash(content)[:12]}")
+
+    response = llm_scheduler.call(
+        lambda: client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        ),
+        est_tokens=estimate_tokens(system_prompt) + estimate_tokens(prompt) + max_tokens
+    )
+    llm_scheduler.record_usage(getattr(response, "usage", None))
+    output = response.choices[0].message.content.strip()
+
+    # 잘리거나 깨진 출력은 캐시하지 않음 (replay 모드에서 영구 실패 방지)
+    if llm_cache is not None and parses_as_json(output):
+        llm_cache.put(LLM_MODEL, template_version, temperature, content, output)
+    return output
+
+def parses_as_json(output):
+    try:
+        json.loads(strip_code_block(output))
+        return True
+    except ValueError:
+        return False
 
 def extract_shard_from_gpt(text):
     prompt = f"""
@@ -28,18 +115,11 @@ Content:
 {text}
 """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You extract human actions from unstructured text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.4,
-            max_tokens=500
+        gpt_output = call_gpt(
+            "You extract human actions from unstructured text.", prompt, text,
+            SHARD_PROMPT_VERSION, temperature=0.4, max_tokens=500
         )
 
-        gpt_output = response.choices[0].message.content.strip()
-
         # 디버깅용 원본 출력
         print("🧠 GPT RAW OUTPUT:")
         print(gpt_output)
@@ -63,6 +143,142 @@ Content:
         return None
 
 
+def extract_shards_from_gpt(texts):
+    # 여러 입력을 동시에 요청하되 결과는 입력 순서대로
+    return llm_scheduler.map(extract_shard_from_gpt, texts)
+
+
+def keyed_version(version, keys):
+    # 일부 필드만 요청하면 프롬프트가 달라지므로 캐시 키에 필드 목록 포함
+    return version if list(keys) == METADATA_KEYS else f"{version}:{','.join(keys)}"
+
+def extract_shard_and_metadata_from_gpt(text, keys=None):
+    # action 과 메타데이터를 한 번의 요청으로 추출 → (shard, metadata)
+    keys = keys or METADATA_KEYS
+    fields = ", ".join(f'"{key}": ...' for key in keys)
+    prompt = f"""
+Extract exactly ONE behavioral action in detail that best represents the following content,
+and the identifying values that appear anywhere in it.
+Return a JSON with these fields only:
+
+  "A": action description,
+  "T_A": action time (ISO 8601 preferred),
+  "C": contextual message content,
+  "metadata": {{{fields}}}
+
+Use null for metadata values that do not appear in the content.
+
+Content:
+{text}
+"""
+    output = ""
+    try:
+        output = call_gpt(
+            "You extract human actions and specific field values from unstructured text.", prompt, text,
+            keyed_version(COMBINED_PROMPT_VERSION, keys), temperature=0.4, max_tokens=700
+        )
+        result = json.loads(strip_code_block(output))
+    except Exception as e:
+        print("❌ Combined extraction failed:", e)
+        print("🔍 Raw GPT output was:")
+        print(output)
+        return None, {}
+
+    entries = result if isinstance(result, list) else [result]
+    metadata = {}
+    for entry in entries:
+        if isinstance(entry, dict) and isinstance(entry.get("metadata"), dict):
+            metadata = metadata or entry["metadata"]
+        if isinstance(entry, dict):
+            entry.pop("metadata", None)
+    print(f"✅ Parsed shard(s): {result}")
+    return result, metadata
+
+
+def strip_code_block(output):
+    output = output.strip()
+    if output.startswith("```"):
+        output = re.sub(r"^```(?:json)?", "", output).rstrip("`").strip()
+    return output
+
+def pack_row_batches(texts, batch_rows, token_budget):
+    batches, current, current_tokens = [], [], 0
+    for row_id, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= batch_rows or current_tokens + tokens > token_budget):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(row_id)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def extract_batch_shards_from_gpt(rows):
+    # rows: [(row_id, text), ...] → {row_id: shard}
+    if len(rows) == 1:
+        return {rows[0][0]: extract_shard_from_gpt(rows[0][1])}
+
+    body = "\n\n".join(f"### row {row_id}\n{text}" for row_id, text in rows)
+    prompt = f"""
+Each row below is a separate record. For EVERY row, extract exactly ONE behavioral action in detail that best represents it.
+Return a JSON array with one object per row, using these fields only:
+
+  "row": the row number shown in the "### row" header,
+  "A": action description,
+  "T_A": action time (ISO 8601 preferred),
+  "C": contextual message content
+
+Rows:
+{body}
+"""
+    try:
+        output = call_gpt(
+            "You extract human actions from unstructured text.", prompt, body,
+            BATCH_PROMPT_VERSION, temperature=0.4, max_tokens=min(4096, 200 * len(rows))
+        )
+    except Exception as e:
+        # 전송/인증/rate limit 오류는 scheduler 가 이미 재시도함 → 나눠서 다시 보내면 요청 수만 늘어남
+        print(f"❌ Batch extraction request failed for {len(rows)} rows: {e}")
+        return {row_id: None for row_id, _ in rows}
+
+    shards = {}
+    try:
+        parsed = json.loads(strip_code_block(output))
+    except json.JSONDecodeError as e:
+        print(f"⚠️ Batch output for {len(rows)} rows is not valid JSON, splitting batch: {e}")
+        parsed = None
+    for entry in parsed if isinstance(parsed, list) else []:
+        if isinstance(entry, dict) and "row" in entry:
+            try:
+                row_id = int(entry.pop("row"))
+            except (TypeError, ValueError):
+                continue
+            shards[row_id] = entry
+    if all(row_id in shards for row_id, _ in rows):
+        return {row_id: shards[row_id] for row_id, _ in rows}
+    if parsed is not None:
+        print(f"⚠️ Batch output covered {len(shards)}/{len(rows)} rows, splitting batch")
+
+    # 파싱 실패 또는 누락된 row 가 있으면 반으로 나눠 다시 요청
+    mid = len(rows) // 2
+    result = extract_batch_shards_from_gpt(rows[:mid])
+    result.update(extract_batch_shards_from_gpt(rows[mid:]))
+    return result
+
+def extract_row_shards_from_gpt(texts, batch_rows=LLM_BATCH_ROWS, token_budget=LLM_BATCH_TOKEN_BUDGET):
+    # 표 형식 증거: 여러 row 를 한 요청에 묶어 system prompt/지시문 오버헤드를 줄임
+    if not batch_rows or batch_rows <= 1:
+        return extract_shards_from_gpt(texts)
+    batches = pack_row_batches(texts, batch_rows, token_budget)
+    shards = {}
+    for result in llm_scheduler.map(
+        lambda ids: extract_batch_shards_from_gpt([(row_id, texts[row_id]) for row_id in ids]), batches
+    ):
+        shards.update(result or {})
+    return [shards.get(row_id) for row_id in range(len(texts))]
+
+
 def get_file_modified_time(file_path):
     ts = os.path.getmtime(file_path)
     return datetime.fromtimestamp(ts).isoformat()
@@ -84,8 +300,13 @@ def extract_eml_received_date(msg):
     for header in received_headers:
         parts = header.split(";")
         if len(parts) > 1:
+            # RFC 2822 형식은 email.utils 로 빠르게 처리하고, 실패하면 dateutil 로 재시도
+            try:
+                return parsedate_to_datetime(parts[-1].strip())
+            except (TypeError, ValueError, IndexError):
+                pass
             try:
-                return date_parse(parts[-1].strip())
+                return date_parse(parts[-1].strip(), fuzzy=True)
             except:
                 continue
     return None
@@ -143,222 +364,646 @@ def extract_actions_from_shard(shard):
             })
     return actions
 
-def parse_text_file(file_path):
+HEAD_BYTES = 64 * 1024
+BINARY_SIGNATURES = (b"SQLite format 3\x00", b"PK\x03\x04", b"\xd0\xcf\x11\xe0", b"%PDF", b"\x89PNG", b"\xff\xd8\xff")
+
+def read_file_bytes(file_path, max_bytes=None):
+    with open(file_path, "rb") as f:
+        return f.read(max_bytes) if max_bytes else f.read()
+
+def is_binary_content(data):
+    head = data[:8192]
+    return head.startswith(BINARY_SIGNATURES) or b"\x00" in head
+
+def decode_bytes(data, encodings=("utf-8", "euc-kr", "cp949")):
+    for enc in encodings:
+        try:
+            return data.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("iso-8859-1")
+
+def cap_content(text, max_chars=LLM_MAX_CONTENT_CHARS):
+    # 너무 긴 원문은 앞부분만 LLM 에 보냄
+    if max_chars and len(text) > max_chars:
+        print(f"✂️ Content truncated from {len(text)} to {max_chars} chars")
+        return text[:max_chars]
+    return text
+
+def text_from_json(data):
+    try:
+        return str(json.loads(data))
+    except ValueError:
+        # 크기 제한으로 잘린 파일 등은 원문 그대로 사용
+        return decode_bytes(data)
+
+def text_from_xml(data):
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
-    except UnicodeDecodeError:
-        with open(file_path, "r", encoding="iso-8859-1") as f:
-            text = f.read()
-    shard = extract_shard_from_gpt(text)
-    return extract_actions_from_shard(shard) if shard else []
-
-def parse_json_file(file_path):
-    with open(file_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    text = str(data)
-    shard = extract_shard_from_gpt(text)
-    return extract_actions_from_shard(shard) if shard else []
-
-def parse_xml_file(file_path):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
-    text = ET.tostring(root, encoding='unicode')
-    shard = extract_shard_from_gpt(text)
-    return extract_actions_from_shard(shard) if shard else []
-
-def parse_html_file(file_path):
-    for enc in ['utf-8', 'euc-kr', 'cp949']:
+        return ET.tostring(ET.fromstring(data), encoding='unicode')
+    except (ET.ParseError, ValueError):
+        return decode_bytes(data)
+
+HTML_SKIP_TAGS = ("script", "style", "noscript", "template")
+HTML_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_\-]+)""", re.I)
+
+class HTMLTextCollector(StdHTMLParser):
+    # selectolax/lxml 이 없을 때 쓰는 표준 라이브러리 파서 (트리를 만들지 않고 텍스트만 수집)
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HTML_SKIP_TAGS:
+            self.skip += 1
+
+    def handle_endtag(self, tag):
+        if tag in HTML_SKIP_TAGS and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if not self.skip:
+            self.parts.append(data)
+
+def html_encoding(head):
+    # 앞부분의 BOM / <meta charset> 으로 인코딩 결정
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = HTML_META_CHARSET.search(head[:4096])
+    if match:
         try:
-            with open(file_path, "r", encoding=enc) as f:
-                content = f.read()
-            break
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return detect_encoding(head[:HEAD_BYTES])
+
+def decode_html(data):
+    # 인코딩을 정하고 한 번만 디코딩
+    return data.decode(html_encoding(data), errors="replace")
+
+def text_from_html(data):
+    html = decode_html(data)
+    if FastHTMLParser is not None:
+        tree = FastHTMLParser(html)
+        for node in tree.css(", ".join(HTML_SKIP_TAGS)):
+            node.decompose()
+        root = tree.body or tree.root
+        text = root.text(separator=" ") if root is not None else ""
+    elif lxml_html is not None and html.strip():
+        doc = lxml_html.document_fromstring(html.encode("utf-8"), parser=lxml_html.HTMLParser(encoding="utf-8"))
+        for node in doc.xpath("|".join(f"//{tag}" for tag in HTML_SKIP_TAGS)):
+            node.drop_tree()
+        text = doc.text_content()
+    else:
+        collector = HTMLTextCollector()
+        collector.feed(html)
+        collector.close()
+        text = " ".join(collector.parts)
+    return " ".join(text.split())
+
+def detect_encoding(head, encodings=("utf-8", "euc-kr", "cp949")):
+    # 파일 앞부분만 보고 인코딩 결정 (잘린 멀티바이트 문자는 허용)
+    for enc in encodings:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
         except UnicodeDecodeError:
             continue
+    return "iso-8859-1"
+
+def read_rest(file_path, head):
+    # head 가 이미 파일 전체면 다시 읽지 않음
+    return head if len(head) < HEAD_BYTES else read_file_bytes(file_path, FILE_MAX_READ_BYTES)
+
+def iter_file_lines(file_path, head):
+    with open(file_path, "r", encoding=detect_encoding(head), errors="replace") as f:
+        yield from f
+
+def iter_plain_pieces(file_path, head):
+    if len(head) < HEAD_BYTES:
+        yield decode_bytes(head)
     else:
-        return []
-    soup = BeautifulSoup(content, "html.parser")
-    text = soup.get_text(separator=' ')
-    shard = extract_shard_from_gpt(text.strip())
-    return extract_actions_from_shard(shard) if shard else []
+        yield from iter_file_lines(file_path, head)
+
+def iter_json_pieces(file_path, head):
+    if os.path.getsize(file_path) <= FILE_MAX_READ_BYTES:
+        yield text_from_json(read_rest(file_path, head))
+    else:
+        # 큰 JSON / JSON Lines 는 줄 단위로 스트리밍
+        yield from iter_file_lines(file_path, head)
+
+def iter_xml_pieces(file_path, head):
+    if os.path.getsize(file_path) <= FILE_MAX_READ_BYTES:
+        yield text_from_xml(read_rest(file_path, head))
+    else:
+        yield from iter_file_lines(file_path, head)
+
+def iter_html_pieces(file_path, head):
+    if os.path.getsize(file_path) <= FILE_MAX_READ_BYTES:
+        yield text_from_html(read_rest(file_path, head))
+        return
+    # 큰 HTML 은 트리를 만들지 않고 표준 파서에 블록 단위로 흘려 보내며 텍스트를 수집 (파일 끝까지)
+    collector = HTMLTextCollector()
+    with open(file_path, "r", encoding=html_encoding(head), errors="replace") as f:
+        rest = ""
+        for block in iter(lambda: f.read(1 << 20), ""):
+            # 마지막 태그 뒤 텍스트는 다음 블록과 이어 붙여 넣음 (블록 경계에서 단어가 잘리지 않도록)
+            block = rest + block
+            cut = block.rfind(">") + 1
+            collector.feed(block[:cut])
+            rest = block[cut:]
+            text = " ".join(" ".join(collector.parts).split())
+            collector.parts = []
+            if text:
+                yield text + "\n"
+        collector.feed(rest)
+    collector.close()
+    text = " ".join(" ".join(collector.parts).split())
+    if text:
+        yield text + "\n"
+
+def split_on_boundaries(text, size):
+    # size 글자 이하 조각으로 나눔. 뒤쪽 절반에서 줄바꿈, 없으면 공백을 찾아 자르고 (토큰 중간을 피함), 둘 다 없을 때만 그대로 자름
+    start = 0
+    while len(text) - start > size:
+        end = start + size
+        cut = text.rfind("\n", start + size // 2, end)
+        if cut < 0:
+            cut = max(text.rfind(" ", start + size // 2, end), text.rfind("\t", start + size // 2, end))
+        cut = end if cut < 0 else cut + 1
+        yield text[start:cut]
+        start = cut
+    if start < len(text):
+        yield text[start:]
+
+def overlap_tail(text, size):
+    # 청크 끝 size 글자. 잘린 첫 토큰은 버리고 다음 공백 뒤부터 시작
+    if size <= 0:
+        return ""
+    if len(text) <= size:
+        return text
+    tail = text[-size:]
+    match = re.search(r"\s", tail)
+    return tail[match.end():] if match and match.end() < len(tail) else tail
+
+def iter_token_chunks(pieces, token_budget=CHUNK_TOKEN_BUDGET, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    # 토큰 예산 (≈ 4 chars/token) 단위로 청크를 만들고, 이전 청크 끝 overlap_tokens 만큼을 다음 청크 앞에 붙임
+    # 예산보다 큰 조각 (JSON/XML/HTML 전체 텍스트 등) 은 줄/공백 경계에서 나누므로 한 조각 안에서도 청크가 겹침
+    limit = max(1, token_budget * 4)
+    overlap = min(max(0, overlap_tokens * 4), limit // 2)
+    buf, fresh = "", False
+    for piece in pieces:
+        for part in split_on_boundaries(piece, limit - overlap):
+            if len(buf) + len(part) > limit:
+                if fresh:
+                    yield buf
+                buf, fresh = overlap_tail(buf, overlap), False
+            buf += part
+            fresh = True
+    if fresh:
+        yield buf
+
+def extract_chunked_actions(chunks, scanner, max_chunks=CHUNK_MAX_PER_FILE):
+    # map: 청크별 추출을 동시에 요청 (한 번에 window 개 청크만 메모리에 유지)
+    # reduce: 겹치는 구간 등에서 나온 같은 action/시각은 한 번만 남김
+    window = llm_scheduler.concurrency * 2
+    chunks = iter(chunks)
+    actions, seen = [], set()
+    missing, found = [], {}
+    count = 0
+
+    def extract(item):
+        idx, chunk = item
+        if not chunk.strip():
+            return None, {}
+        if idx == 0 and missing:
+            return extract_shard_and_metadata_from_gpt(chunk, missing)
+        return extract_shard_from_gpt(chunk), {}
+
+    while max_chunks is None or count < max_chunks:
+        batch = list(islice(chunks, window if max_chunks is None else min(window, max_chunks - count)))
+        if not batch:
+            break
+        for chunk in batch:
+            scanner.feed(chunk)
+        if count == 0:
+            # 첫 window 에서 규칙으로 못 찾은 필드만 첫 청크 요청에 함께 물어봄
+            missing = missing_metadata_fields(scanner)
+
+        for idx, result in enumerate(llm_scheduler.map(extract, list(enumerate(batch, count))), count):
+            shard, chunk_found = result or (None, {})
+            if idx == 0:
+                found = chunk_found
+            for action in extract_actions_from_shard(shard) if shard else []:
+                key = (" ".join(str(action.get("action")).lower().split()), str(action.get("timestamp")))
+                if key in seen:
+                    continue
+                seen.add(key)
+                action["source_chunk"] = idx
+                actions.append(action)
+        count += len(batch)
+
+    if max_chunks is not None and count == max_chunks and next(chunks, None) is not None:
+        print(f"✂️ Stopped after {max_chunks} chunks (CHUNK_MAX_PER_FILE)")
+    if count <= 1:
+        for action in actions:
+            action.pop("source_chunk", None)
+
+    metadata = {key: scanner.values.get(key) for key in METADATA_KEYS}
+    sources = dict(scanner.sources)
+    merge_llm_metadata(metadata, sources, found, missing)
+    return actions, metadata, sources
 
-def parse_eml_file(file_path):
-    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-        msg = email.message_from_file(f)
+EMAIL_PARSER = BytesParser(policy=compat32)
 
+def message_timestamp(msg):
+    # LLM 대신 Received 헤더(없으면 Date 헤더)로 시각 결정
+    received = extract_eml_received_date(msg)
+    if received is None:
+        try:
+            received = parsedate_to_datetime(msg.get("Date"))
+        except (TypeError, ValueError, IndexError):
+            return None
+    return received.isoformat() if received else None
+
+def is_attachment(part):
+    disposition = str(part.get("Content-Disposition") or "").lower()
+    return disposition.startswith("attachment") or part.get_filename() is not None \
+        or part.get_content_maintype() not in ("text", "multipart", "message")
+
+def attachment_fingerprint(part):
+    # 첨부는 디코딩하지 않고 인코딩된 payload 의 해시/크기만 기록
+    payload = part.get_payload(decode=False)
+    raw = payload.encode("ascii", errors="ignore") if isinstance(payload, str) else b""
+    return {
+        "filename": decode_mime_header(part.get_filename()),
+        "contentType": part.get_content_type(),
+        "encodedSize": len(raw),
+        "sha256": hashlib.sha256(raw).hexdigest()
+    }
+
+def message_to_text(msg, max_body_chars=EMAIL_MAX_BODY_CHARS):
+    # → (프롬프트용 텍스트, 첨부 fingerprint 목록)
     subject = decode_mime_header(msg.get("Subject"))
     sender = decode_mime_header(msg.get("From"))
     date = decode_mime_header(msg.get("Date"))
+    # 메타데이터(IP 등)는 주로 Received/To 헤더에 있으므로 함께 전달
+    extra = "\n".join(f"{key}: {decode_mime_header(value)}" for key, value in msg.items()
+                      if key.lower() in ("to", "received", "x-originating-ip"))
 
-    body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_type() == "text/plain":
-                try:
-                    body += part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
-                except:
-                    continue
-    else:
+    body, attachments = "", []
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        if is_attachment(part):
+            attachments.append(attachment_fingerprint(part))
+            continue
+        if len(body) >= max_body_chars or (msg.is_multipart() and part.get_content_type() != "text/plain"):
+            continue
         try:
-            body = msg.get_payload(decode=True).decode(msg.get_content_charset() or "utf-8", errors="ignore")
+            body += part.get_payload(decode=True).decode(part.get_content_charset() or "utf-8", errors="ignore")
         except:
-            body = ""
+            continue
+
+    return f"Subject: {subject}\nFrom: {sender}\nDate: {date}\n{extra}\n\n{body[:max_body_chars]}", attachments
+
+def iter_mbox_messages(file_path):
+    # "From " 구분 줄 기준으로 메시지를 하나씩 잘라 raw bytes 로 yield (한 번에 메시지 하나만 메모리에 유지)
+    lines = []
+    with open(file_path, "rb") as f:
+        for line in f:
+            if line.startswith(b"From "):
+                if lines:
+                    yield b"".join(lines)
+                lines = []
+                continue
+            lines.append(line)
+    if lines:
+        yield b"".join(lines)
 
-    text = f"Subject: {subject}\nFrom: {sender}\nDate: {date}\n\n{body}"
-    shard = extract_shard_from_gpt(text)
-    return extract_actions_from_shard(shard) if shard else []
+def is_maildir_message(file_path):
+    path = Path(file_path)
+    return path.parent.name in ("cur", "new") and (path.parent.parent / "cur").is_dir() \
+        and (path.parent.parent / "new").is_dir()
 
-def parse_csv_file(file_path):
-    df = pd.read_csv(file_path)
+def extract_message_chunk(messages, offset=0):
+    # messages: [(text, timestamp, message_id, attachments), ...]
     actions = []
-    for _, row in df.iterrows():
-        content = "\n".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-        shard = extract_shard_from_gpt(content)
-        if shard:
-            actions.extend(extract_actions_from_shard(shard))
+    shards = extract_row_shards_from_gpt([text for text, *_ in messages])
+    for msg_idx, ((text, timestamp, message_id, attachments), shard) in enumerate(zip(messages, shards)):
+        entries = shard if isinstance(shard, list) else [shard]
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("A"):
+                continue
+            if timestamp:
+                entry["T_A"] = timestamp
+            for action in extract_actions_from_shard(entry):
+                action["source_message"] = offset + msg_idx
+                action["message_id"] = message_id
+                if attachments:
+                    action["attachments"] = attachments
+                actions.append(action)
     return actions
 
-def parse_excel_file(file_path):
-    df = pd.read_excel(file_path)
+def parse_mbox_file(file_path, sample=None, scanner=None):
+    actions, messages, count = [], [], 0
+    start = time.time()
+    for raw in islice(iter_mbox_messages(file_path), EMAIL_MAX_MESSAGES):
+        msg = EMAIL_PARSER.parsebytes(raw)
+        text, attachments = message_to_text(msg)
+        messages.append((text, message_timestamp(msg), msg.get("Message-ID"), attachments))
+        if scanner is not None:
+            scanner.feed(text)
+        if sample is not None:
+            add_sample_text(sample, [text])
+        if len(messages) >= EMAIL_CHUNK_MESSAGES:
+            actions.extend(extract_message_chunk(messages, count))
+            count += len(messages)
+            messages = []
+    if messages:
+        actions.extend(extract_message_chunk(messages, count))
+        count += len(messages)
+    print(f"📬 {os.path.basename(file_path)} → {count} messages streamed in {time.time() - start:.1f}s")
+    return actions
+
+def row_to_text(row):
+    return "\n".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
+
+def iter_csv_row_batches(file_path, batch_rows=TABLE_CHUNK_ROWS):
+    # → (sheet, offset, texts): CSV 는 chunksize 단위로 스트리밍
+    offset = 0
+    for df in pd.read_csv(file_path, chunksize=batch_rows):
+        yield None, offset, [row_to_text(row) for row in df.to_dict("records")]
+        offset += len(df)
+
+def excel_row_to_text(header, values):
+    return "\n".join(f"{col}: {val}" for col, val in zip(header, values) if val is not None and val != "")
+
+def iter_excel_row_batches(file_path, batch_rows=TABLE_CHUNK_ROWS):
+    # read-only 워크북으로 시트별 row 를 하나씩 읽어 batch_rows 개씩 yield → (sheet, offset, texts)
+    if openpyxl is None or file_path.lower().endswith(".xls"):
+        for sheet, df in pd.read_excel(file_path, sheet_name=None).items():
+            for offset in range(0, len(df), batch_rows):
+                yield sheet, offset, [row_to_text(row) for row in df.iloc[offset:offset + batch_rows].to_dict("records")]
+        return
+
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            header, texts, offset = None, [], 0
+            for values in ws.iter_rows(values_only=True):
+                if all(v is None for v in values):
+                    continue
+                if header is None:
+                    header = [str(v) if v is not None else f"Unnamed: {i}" for i, v in enumerate(values)]
+                    continue
+                if len(values) > len(header):
+                    header += [f"Unnamed: {i}" for i in range(len(header), len(values))]
+                texts.append(excel_row_to_text(header, values))
+                if len(texts) >= batch_rows:
+                    yield ws.title, offset, texts
+                    offset += len(texts)
+                    texts = []
+            if texts:
+                yield ws.title, offset, texts
+    finally:
+        wb.close()
+
+def extract_table_batch(texts, sheet=None, offset=0):
+    actions = []
+    for row_idx, shard in enumerate(extract_row_shards_from_gpt(texts)):
+        for action in extract_actions_from_shard(shard) if shard else []:
+            if sheet is not None:
+                action["source_sheet"] = sheet
+            action["source_row"] = offset + row_idx
+            actions.append(action)
+    return actions
+
+
+OPAQUE_VALUE = re.compile(r"[A-Za-z0-9+/=_\-]+")
+
+def quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def is_opaque_value(val):
+    # BLOB, 긴 hex/base64 토큰 등 프롬프트에 넣어도 의미 없는 값
+    if isinstance(val, (bytes, bytearray, memoryview)):
+        return True
+    return isinstance(val, str) and len(val) > SQLITE_MAX_VALUE_CHARS and bool(OPAQUE_VALUE.fullmatch(val))
+
+def sqlite_row_to_text(row):
+    return "\n".join(f"{col}: {val}" for col, val in row.items() if val is not None and not is_opaque_value(val))
+
+def sqlite_table_columns(conn, table, wanted=None):
+    columns = []
+    for _, name, col_type, *_ in conn.execute(f"PRAGMA table_info({quote_identifier(table)})"):
+        if "BLOB" in (col_type or "").upper():
+            continue
+        if wanted and name not in wanted:
+            continue
+        columns.append(name)
+    return columns
+
+def iter_sqlite_chunks(conn, sql, chunk_rows=500, max_rows=None):
+    cursor = conn.execute(sql)
+    names = [d[0] for d in cursor.description]
+    fetched = 0
+    while max_rows is None or fetched < max_rows:
+        size = chunk_rows if max_rows is None else min(chunk_rows, max_rows - fetched)
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        fetched += len(rows)
+        yield [dict(zip(names, r)) for r in rows]
+    cursor.close()
+
+def extract_sqlite_chunk(rows, source, timestamp=None, fixed_ts=None, offset=0, sample=None, scanner=None):
     actions = []
-    for _, row in df.iterrows():
-        content = "\n".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-        shard = extract_shard_from_gpt(content)
-        if shard:
-            actions.extend(extract_actions_from_shard(shard))
+    texts = [sqlite_row_to_text(row) for row in rows]
+    if sample is not None:
+        add_sample_text(sample, texts)
+    if scanner is not None:
+        for text in texts:
+            scanner.feed(text)
+    shards = extract_row_shards_from_gpt(texts)
+    for row_idx, (row, shard) in enumerate(zip(rows, shards)):
+        entries = shard if isinstance(shard, list) else [shard]
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("A"):
+                continue
+            # 알려진 타임스탬프 컬럼은 LLM 결과 대신 로컬 변환값 사용
+            if timestamp:
+                converted = convert_timestamp(row.get(timestamp[0]), timestamp[1])
+                if converted:
+                    entry["T_A"] = converted
+            for action in extract_actions_from_shard(entry):
+                action["source_table"] = source
+                action["source_row"] = offset + row_idx
+                if fixed_ts:
+                    action["T_S"] = fixed_ts
+                actions.append(action)
     return actions
 
+def add_sample_text(sample, texts, max_chars=LLM_MAX_CONTENT_CHARS):
+    # 메타데이터 추출용으로 앞쪽 row 텍스트만 모아 둠
+    for text in texts:
+        if sum(map(len, sample)) >= max_chars:
+            return
+        sample.append(text)
 
-def parse_sqlite_file(file_path):
+def parse_sqlite_file(file_path, sample=None, scanner=None):
     actions = []
     db_name = os.path.basename(file_path)
+    schema = get_sqlite_schema(db_name)
+    skipped = {t.upper() for t in SQLITE_EXCLUDE_TABLES + schema.get("covered_tables", [])}
+    included = {t.upper() for t in SQLITE_INCLUDE_TABLES} if SQLITE_INCLUDE_TABLES else None
 
+    conn = sqlite3.connect(f"{Path(file_path).resolve().as_uri()}?mode=ro", uri=True)
     try:
-        conn = sqlite3.connect(file_path)
-
-        if db_name == "Favicons.db":
-            query = """
-            SELECT im.page_url, im.icon_id, fb.image_data, fb.last_updated, fb.width, fb.height
-            FROM icon_mapping im
-            JOIN favicon_bitmaps fb ON im.icon_id = fb.icon_id
-            """
-            df = pd.read_sql_query(query, conn)
-
-            for idx, row in df.iterrows():
-                text_content = "\n".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-                print(text_content)
-
-                shard = extract_shard_from_gpt(text_content)
-                print(f"🧠 GPT SHARD: {shard}")
-
-                if shard and isinstance(shard, dict) and shard.get("A"):
-                    shard["source_table"] = "icon_mapping + favicon_bitmaps"
-
-                    last_updated = row.get("last_updated")
-                    if last_updated:
-                        try:
-                            parsed = pd.to_datetime(str(last_updated), errors='coerce')
-                            if pd.notna(parsed):
-                                shard["T_A"] = parsed.isoformat()
-                        except Exception as e:
-                            print(f"⚠️ last_updated 변환 실패: {last_updated} → {e}")
-
-                    try:
-                        shard["T_S"] = datetime.strptime("2020-12-29 17:30:22", "%Y-%m-%d %H:%M:%S").isoformat()
-                    except Exception as e:
-                        print(f"⚠️ T_S 고정값 설정 실패: {e}")
-
-                    actions_before = len(actions)
-                    actions.extend(extract_actions_from_shard(shard))
-                    print(f"➕ Actions added: {len(actions) - actions_before}")
-                else:
-                    print(f"⚠️ Skipped invalid shard (no action): {shard}")
-
-        conn = sqlite3.connect(file_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-
-        for table_name in tables:
-            table = table_name[0]
+        jobs = [(q["source"], q["sql"], q.get("timestamp"), q.get("fixed_T_S")) for q in schema.get("queries", [])]
+
+        tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for table in tables:
+            if table.upper() in skipped or (included is not None and table.upper() not in included):
+                continue
+            spec = get_table_spec(schema, table)
+            columns = sqlite_table_columns(conn, table, spec.get("columns"))
+            if not columns:
+                continue
+            sql = f"SELECT {', '.join(map(quote_identifier, columns))} FROM {quote_identifier(table)}"
+            if spec.get("where"):
+                sql += f" WHERE {spec['where']}"
+            jobs.append((table, sql, spec.get("timestamp"), spec.get("fixed_T_S")))
+
+        for source, sql, timestamp, fixed_ts in jobs:
             try:
-                df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
-                for _, row in df.iterrows():
-                    text = "\n".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-                    shard = extract_shard_from_gpt(text)
-
-                    if shard:
-                        if isinstance(shard, dict) and shard.get("A"):
-                            shard["source_table"] = table
-                            actions.extend(extract_actions_from_shard(shard))
-
-                        elif isinstance(shard, list):
-                            for s in shard:
-                                if isinstance(s, dict) and s.get("A"):
-                                    s["source_table"] = table
-                                    actions.append(s)
-
-                        if db_name == "tms_1.0.db" and table.strip().upper() == "TBL_MSG":
-                            reg_date = row.get("REG_DATE")
-                            if reg_date and pd.notna(reg_date):
-                                try:
-                                    parsed = pd.to_datetime(str(reg_date), errors='coerce')
-                                    if pd.notna(parsed):
-                                        for s in extract_actions_from_shard(shard):
-                                            s["T_A"] = parsed.isoformat()
-                                except Exception as e:
-                                    print(f"⚠️ REG_DATE 변환 실패: {reg_date} → {e}")
-                    else:
-                        print(f"⚠️ Skipped shard (no action): {shard}")
-            except Exception as e:
-                print(f"⚠️ Failed to read table {table}: {e}")
+                offset = 0
+                for rows in iter_sqlite_chunks(conn, sql, SQLITE_CHUNK_ROWS, SQLITE_MAX_ROWS_PER_TABLE):
+                    actions.extend(extract_sqlite_chunk(rows, source, timestamp, fixed_ts, offset, sample, scanner))
+                    offset += len(rows)
+                print(f"🗃️ {db_name}:{source} → {offset} rows streamed")
+            except sqlite3.Error as e:
+                print(f"⚠️ Failed to read table {source}: {e}")
     finally:
         conn.close()
 
     return actions
 
 
+MAILBOX_EXTENSIONS = [".mbox", ".mbx"]
+CHUNKED_SOURCES = {
+    ".txt": iter_plain_pieces,
+    ".json": iter_json_pieces,
+    ".xml": iter_xml_pieces,
+    ".html": iter_html_pieces,
+    ".htm": iter_html_pieces
+}
+TABLE_SOURCES = {
+    ".csv": iter_csv_row_batches,
+    ".xls": iter_excel_row_batches,
+    ".xlsx": iter_excel_row_batches,
+    ".xlsm": iter_excel_row_batches
+}
+
+def merge_llm_metadata(metadata, sources, found, keys):
+    for key in keys:
+        value = found.get(key) if isinstance(found, dict) else None
+        if value not in (None, "", "null") and metadata.get(key) is None:
+            metadata[key] = value
+            sources[key] = "llm"
+
+def missing_metadata_fields(scanner):
+    return [key for key in METADATA_LLM_FALLBACK_FIELDS if key not in scanner.values]
+
+def extract_metadata_fields(scanner, text):
+    # 규칙 기반 추출기로 찾지 못한 필드만 LLM 으로 보충 → (metadata, sources)
+    metadata = {key: scanner.values.get(key) for key in METADATA_KEYS}
+    sources = dict(scanner.sources)
+    missing = missing_metadata_fields(scanner)
+    if missing and text.strip():
+        merge_llm_metadata(metadata, sources, extract_metadata_fields_from_gpt(text, missing), missing)
+    return metadata, sources
+
+def extract_text_actions(text, scanner):
+    # 한 번의 요청으로 action 추출, 규칙으로 못 찾은 메타데이터 필드는 같은 요청에서 보충
+    scanner.feed(text)
+    text = cap_content(text)
+    metadata = {key: scanner.values.get(key) for key in METADATA_KEYS}
+    sources = dict(scanner.sources)
+    missing = missing_metadata_fields(scanner)
+    actions = []
+    if text.strip():
+        if missing:
+            shard, found = extract_shard_and_metadata_from_gpt(text, missing)
+            merge_llm_metadata(metadata, sources, found, missing)
+        else:
+            shard = extract_shard_from_gpt(text)
+        actions = extract_actions_from_shard(shard) if shard else []
+    return actions, metadata, sources
+
 def parse_file_by_extension(file_path):
+    # 파일은 한 번만 읽고, 텍스트 형식은 action + 메타데이터를 한 번의 요청으로 추출
+    # 메타데이터는 규칙 기반 추출기가 먼저 찾고, 남은 필드만 LLM 에 요청
     ext = os.path.splitext(file_path)[1].lower()
+    scanner = MetadataRuleScanner(METADATA_KEYS)
+    actions, metadata, sources = [], {}, {}
 
-    # 기본 파일별 action 추출
-    if ext == ".txt":
-        content = parse_text_file(file_path)
-    elif ext == ".json":
-        content = parse_json_file(file_path)
-    elif ext == ".xml":
-        content = parse_xml_file(file_path)
-    elif ext in [".html", ".htm"]:
-        content = parse_html_file(file_path)
-    elif ext == ".eml":
-        content = parse_eml_file(file_path)
-    elif ext == ".csv":
-        content = parse_csv_file(file_path)
-    elif ext in [".xls", ".xlsx"]:
-        content = parse_excel_file(file_path)
-    elif ext in [".db", ".sqlite"]:
-        content = parse_sqlite_file(file_path)
+    if ext in [".db", ".sqlite"]:
+        sample = []
+        actions = parse_sqlite_file(file_path, sample, scanner)
+        metadata, sources = extract_metadata_fields(scanner, cap_content("\n\n".join(sample)))
+    elif ext in TABLE_SOURCES:
+        # CSV/Excel 은 시트별 row 묶음 단위로 스트리밍
+        sample = []
+        for sheet, offset, texts in TABLE_SOURCES[ext](file_path):
+            for text in texts:
+                scanner.feed(text)
+            add_sample_text(sample, texts)
+            actions.extend(extract_table_batch(texts, sheet, offset))
+        metadata, sources = extract_metadata_fields(scanner, cap_content("\n\n".join(sample)))
+    elif ext in CHUNKED_SOURCES:
+        # 큰 텍스트/JSON/XML/HTML 은 토큰 예산 단위 청크로 나눠 map-reduce 추출
+        head = read_file_bytes(file_path, HEAD_BYTES)
+        if is_binary_content(head):
+            print(f"⚠️ Skipping binary content in {file_path}")
+        else:
+            chunks = iter_token_chunks(CHUNKED_SOURCES[ext](file_path, head))
+            actions, metadata, sources = extract_chunked_actions(chunks, scanner)
+    elif ext in MAILBOX_EXTENSIONS:
+        sample = []
+        actions = parse_mbox_file(file_path, sample, scanner)
+        metadata, sources = extract_metadata_fields(scanner, cap_content("\n\n".join(sample)))
+    elif ext == ".eml" or is_maildir_message(file_path):
+        msg = EMAIL_PARSER.parsebytes(read_file_bytes(file_path, FILE_MAX_READ_BYTES))
+        text, attachments = message_to_text(msg)
+        actions, metadata, sources = extract_text_actions(text, scanner)
+        timestamp = message_timestamp(msg)
+        for action in actions:
+            if timestamp:
+                action["timestamp"] = timestamp
+            if attachments:
+                action["attachments"] = attachments
     else:
-        content = []
-
-    # 메타데이터 추출
-    try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            raw_text = f.read()
-    except:
-        raw_text = ""
-
-    metadata = extract_metadata_fields_from_gpt(raw_text) if raw_text else {}
+        data = read_file_bytes(file_path, FILE_MAX_READ_BYTES)
+        if is_binary_content(data):
+            print(f"⚠️ Skipping binary content in {file_path}")
+        else:
+            # 알 수 없는 확장자의 텍스트 파일은 메타데이터만 추출
+            full_text = decode_bytes(data)
+            scanner.feed(full_text)
+            metadata, sources = extract_metadata_fields(scanner, cap_content(full_text))
 
     return {
         "filePath": file_path,
-        "actions": content,
-        "metadata": metadata
+        "actions": actions,
+        "metadata": metadata,
+        "metadataSource": sources
     }
 
 
-def extract_metadata_fields_from_gpt(text):
-    keys = ["device_id", "user_id", "address", "card_number", "ip_address"]
+def extract_metadata_fields_from_gpt(text, keys=None):
+    keys = keys or METADATA_KEYS
+    fields = ",\n".join(f'  "{key}": ...' for key in keys)
     prompt = f"""
 You are an information extractor. Extract values for the following keys from the content below:
 {', '.join(keys)}
@@ -367,28 +1012,18 @@ If the content includes any value that looks like a device ID, user ID, IP addre
 
 Return result in JSON:
 {{
-  "device_id": ...,
-  "user_id": ...,
-  "address": ...,
-  "card_number": ...,
-  "ip_address": ...
+{fields}
 }}
 
 Content:
 {text}
 """
+    output = ""
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You extract specific field values from unstructured text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=300
+        output = call_gpt(
+            "You extract specific field values from unstructured text.", prompt, text,
+            keyed_version(METADATA_PROMPT_VERSION, keys), temperature=0.3, max_tokens=300
         )
-
-        output = response.choices[0].message.content.strip()
         if output.startswith("```json"):
             output = output.replace("```json", "").replace("```", "").strip()
             print("🧠 GPT METADATA RAW OUTPUT:")
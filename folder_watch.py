@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import threading
+from config import (WATCH_DEBOUNCE_SECONDS, WATCH_MAX_DELAY_SECONDS, WATCH_POLL_SECONDS, WATCH_EMIT_SECONDS,
+                    WATCH_METRICS_PATH)
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+# 쓰는 중인 임시 파일 / 편집기 swap 파일은 무시
+TEMP_SUFFIXES = (".tmp", ".prev", ".part", ".crdownload", ".swp", "~")
+
+class ChangeQueue:
+    # 폴더별 변경 경로 대기열. 마지막 이벤트 후 debounce 초 동안 조용하면 (또는 max_delay 초가 지나면) 배치로 내보냄
+    def __init__(self, debounce=WATCH_DEBOUNCE_SECONDS, max_delay=WATCH_MAX_DELAY_SECONDS, ignore=()):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.ignore = [os.path.abspath(p) for p in ignore]
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def add(self, folder, path):
+        path = os.path.abspath(path)
+        name = os.path.basename(path)
+        if name.startswith((".", "~$")) or name.endswith(TEMP_SUFFIXES):
+            return
+        if any(path == p or path.startswith(p + os.sep) for p in self.ignore):
+            return
+        now = time.time()
+        with self.lock:
+            entry = self.pending.setdefault(folder, {"paths": set(), "first": now, "last": now})
+            entry["paths"].add(path)
+            entry["last"] = now
+
+    def ready(self):
+        # → [(folder, paths, first_event_time)]
+        now = time.time()
+        batches = []
+        with self.lock:
+            for folder, entry in list(self.pending.items()):
+                if now - entry["last"] >= self.debounce or now - entry["first"] >= self.max_delay:
+                    batches.append((folder, sorted(entry["paths"]), entry["first"]))
+                    del self.pending[folder]
+        return batches
+
+    def depth(self):
+        with self.lock:
+            return sum(len(entry["paths"]) for entry in self.pending.values())
+
+    def lag(self):
+        # 가장 오래 기다린 변경의 대기 시간 (초)
+        with self.lock:
+            firsts = [entry["first"] for entry in self.pending.values()]
+        return time.time() - min(firsts) if firsts else 0.0
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, folder, queue):
+        self.folder = folder
+        self.queue = queue
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            if path:
+                self.queue.add(self.folder, os.fsdecode(path))
+
+class PollingWatcher(threading.Thread):
+    # watchdog 이 없거나 네트워크/동기화 드라이브처럼 이벤트가 오지 않는 경우: size/mtime 스냅샷 비교
+    def __init__(self, folders, queue, interval=WATCH_POLL_SECONDS):
+        super().__init__(daemon=True)
+        self.folders = folders
+        self.queue = queue
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.snapshots = {folder: self._snapshot(folder) for folder in folders}
+
+    def _snapshot(self, folder):
+        snapshot = {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            for folder in self.folders:
+                current = self._snapshot(folder)
+                previous = self.snapshots[folder]
+                for path in set(current) | set(previous):
+                    if current.get(path) != previous.get(path):
+                        self.queue.add(folder, path)
+                self.snapshots[folder] = current
+
+    def stop(self):
+        self.stopped.set()
+
+class WatchMetrics:
+    def __init__(self, path=WATCH_METRICS_PATH):
+        self.path = path
+        self.started = time.time()
+        self.batches = 0
+        self.files = 0
+        self.busy_seconds = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.errors = 0
+
+    def record(self, n_files, first_event, started, finished):
+        # lag = 첫 변경 이벤트 → 그래프 갱신 완료까지
+        self.batches += 1
+        self.files += n_files
+        self.busy_seconds += finished - started
+        self.last_lag = finished - first_event
+        self.max_lag = max(self.max_lag, self.last_lag)
+
+    def snapshot(self, queue):
+        uptime = time.time() - self.started
+        return {
+            "queue_depth": queue.depth(),
+            "queue_lag_seconds": round(queue.lag(), 3),
+            "last_update_lag_seconds": round(self.last_lag, 3),
+            "max_update_lag_seconds": round(self.max_lag, 3),
+            "batches": self.batches,
+            "files_processed": self.files,
+            "files_per_second": round(self.files / self.busy_seconds, 3) if self.busy_seconds else 0.0,
+            "errors": self.errors,
+            "uptime_seconds": round(uptime, 1)
+        }
+
+    def report(self, queue):
+        stats = self.snapshot(queue)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(stats, f, indent=2)
+        print(f"📈 Watch: queue={stats['queue_depth']} files, lag={stats['queue_lag_seconds']}s, "
+              f"last update lag={stats['last_update_lag_seconds']}s, {stats['files_per_second']} files/s "
+              f"({stats['files_processed']} files in {stats['batches']} batches, {stats['errors']} errors)")
+        return stats
+
+def watch_folders(folders, on_batch, on_emit, emit_interval=WATCH_EMIT_SECONDS, polling=False, ignore=(),
+                  stop_event=None, tick=0.2):
+    # on_batch(folder, paths): 변경 배치 처리 (파싱 + 그래프 갱신), on_emit(folder): HTML view 출력
+    # stop_event 가 set 되거나 Ctrl+C 로 종료
+    queue = ChangeQueue(ignore=ignore)
+    metrics = WatchMetrics()
+    stop_event = stop_event or threading.Event()
+
+    if Observer is not None and not polling:
+        watcher = Observer()
+        for folder in folders:
+            watcher.schedule(_EventHandler(folder, queue), folder, recursive=True)
+        mode = "filesystem events"
+    else:
+        watcher = PollingWatcher(folders, queue)
+        mode = f"polling every {watcher.interval}s"
+    watcher.start()
+    print(f"👀 Watching {len(folders)} folder(s) ({mode}); debounce {queue.debounce}s, views every {emit_interval}s")
+
+    dirty = set()
+    last_emit = last_report = time.time()
+    reported = 0
+    try:
+        while not stop_event.is_set():
+            for folder, paths, first_event in queue.ready():
+                started = time.time()
+                try:
+                    on_batch(folder, paths)
+                    dirty.add(folder)
+                except Exception as e:
+                    # 한 배치의 실패가 watch 를 멈추지 않도록 (다음 변경 때 manifest 기준으로 다시 시도)
+                    metrics.errors += 1
+                    print(f"❌ Watch update failed for {folder}: {type(e).__name__}: {e}")
+                metrics.record(len(paths), first_event, started, time.time())
+
+            now = time.time()
+            if dirty and now - last_emit >= emit_interval:
+                for folder in sorted(dirty):
+                    on_emit(folder)
+                dirty.clear()
+                last_emit = now
+            if now - last_report >= max(emit_interval, 1.0) and (metrics.batches != reported or queue.depth()):
+                metrics.report(queue)
+                last_report, reported = now, metrics.batches
+            stop_event.wait(tick)
+    except KeyboardInterrupt:
+        print("🛑 Watch stopped")
+    finally:
+        watcher.stop()
+        watcher.join()
+        for folder in sorted(dirty):
+            on_emit(folder)
+        metrics.report(queue)
+    return metrics
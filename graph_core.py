@@ -0,0 +1,181 @@
+import json
+import numpy as np
+import networkx as nx
+from scipy import sparse
+
+# 배열 기반 그래프: node 는 위치 0..n-1 (int32), node_keys[k] 가 원래 node 이름 (shard_df index 등)
+# 엣지는 CSR (indptr, indices) 순서로 저장하고, 엣지 속성은 같은 순서의 typed 배열
+#   - float 속성: float32, NaN = 해당 엣지에 속성 없음
+#   - "type": int8 코드 (EDGE_TYPES 의 위치, -1 = 없음)
+# 무방향 그래프는 (낮은 위치 → 높은 위치) 로 한 번만 저장
+EDGE_TYPES = ("rst", "causal", "both")
+
+def _index_dtype(n, nnz):
+    # scipy 가 복사 없이 쓸 수 있도록 indptr / indices 를 같은 정수형으로
+    return np.int32 if max(n, nnz) < np.iinfo(np.int32).max else np.int64
+
+def _py(value):
+    # numpy scalar → python 값 (float32 는 유효 자릿수만 남김: 0.35f → 0.35)
+    if isinstance(value, np.floating):
+        return round(float(value), 6)
+    return value.item() if isinstance(value, np.generic) else value
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+class ArrayGraph:
+    def __init__(self, node_keys, indptr, indices, edge_attrs=None, node_attrs=None, directed=True):
+        self.node_keys = list(node_keys)
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_attrs = edge_attrs or {}
+        self.node_attrs = node_attrs or {}
+        self.directed = directed
+
+    @classmethod
+    def from_edges(cls, node_keys, src, dst, edge_attrs=None, node_attrs=None, directed=True):
+        # (src, dst) 위치쌍 → CSR. 무방향이면 (min, max) 로 정규화
+        n = len(node_keys)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if not directed:
+            src, dst = np.minimum(src, dst), np.maximum(src, dst)
+        order = np.lexsort((dst, src))
+        dtype = _index_dtype(n, len(src))
+        indptr = np.zeros(n + 1, dtype=dtype)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        attrs = {name: np.asarray(values)[order] for name, values in (edge_attrs or {}).items()}
+        return cls(node_keys, indptr, dst[order].astype(dtype), attrs, node_attrs, directed)
+
+    @classmethod
+    def from_networkx(cls, G):
+        node_keys = list(G.nodes())
+        position = {node: k for k, node in enumerate(node_keys)}
+        node_attrs = {}
+        for k, (_, data) in enumerate(G.nodes(data=True)):
+            for name, value in data.items():
+                node_attrs.setdefault(name, [None] * len(node_keys))[k] = value
+
+        edges = list(G.edges(data=True))
+        src = np.fromiter((position[u] for u, _, _ in edges), dtype=np.int64, count=len(edges))
+        dst = np.fromiter((position[v] for _, v, _ in edges), dtype=np.int64, count=len(edges))
+        edge_attrs = {}
+        for k, (_, _, data) in enumerate(edges):
+            for name, value in data.items():
+                if name == "type":
+                    column = edge_attrs.setdefault(name, np.full(len(edges), -1, dtype=np.int8))
+                    column[k] = EDGE_TYPES.index(value) if value in EDGE_TYPES else -1
+                else:
+                    edge_attrs.setdefault(name, np.full(len(edges), np.nan, dtype=np.float32))[k] = value
+        return cls.from_edges(node_keys, src, dst, edge_attrs, node_attrs, G.is_directed())
+
+    def extend(self, other):
+        # other 의 엣지와 처음 보는 node 를 덧붙인 새 ArrayGraph (기존 node 의 순서/속성은 그대로)
+        # 두 그래프에 같은 엣지가 없다고 가정 (증분 갱신의 새 쌍은 항상 새 node 를 포함)
+        node_keys = list(self.node_keys)
+        position = {node: k for k, node in enumerate(node_keys)}
+        for node in other.node_keys:
+            if node not in position:
+                position[node] = len(node_keys)
+                node_keys.append(node)
+        remap = np.array([position[node] for node in other.node_keys], dtype=np.int64)
+        n_old, n = len(self.node_keys), len(node_keys)
+
+        node_attrs = {}
+        for name in set(self.node_attrs) | set(other.node_attrs):
+            values = list(self.node_attrs.get(name, [None] * n_old)) + [None] * (n - n_old)
+            for k, value in zip(remap.tolist(), other.node_attrs.get(name, [None] * len(remap))):
+                if k >= n_old:
+                    values[k] = value
+            node_attrs[name] = values
+
+        src, dst = self.edge_arrays()
+        other_src, other_dst = other.edge_arrays()
+        edge_attrs = {}
+        for name in set(self.edge_attrs) | set(other.edge_attrs):
+            dtype, fill = (np.int8, -1) if name == "type" else (np.float32, np.nan)
+            edge_attrs[name] = np.concatenate([
+                self.edge_attrs.get(name, np.full(len(src), fill, dtype=dtype)),
+                other.edge_attrs.get(name, np.full(len(other_src), fill, dtype=dtype))
+            ]).astype(dtype)
+        return ArrayGraph.from_edges(
+            node_keys, np.concatenate([src.astype(np.int64), remap[other_src]]),
+            np.concatenate([dst.astype(np.int64), remap[other_dst]]), edge_attrs, node_attrs, self.directed
+        )
+
+    def number_of_nodes(self):
+        return len(self.node_keys)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def is_directed(self):
+        return self.directed
+
+    def edge_arrays(self):
+        # → (src, dst) 위치 배열 (CSR 순서)
+        n = len(self.node_keys)
+        src = np.repeat(np.arange(n, dtype=self.indices.dtype), np.diff(self.indptr))
+        return src, self.indices
+
+    def to_scipy(self, attr=None, symmetric=False):
+        # attr 배열과 CSR 구조를 복사 없이 공유하는 scipy.sparse 행렬 (attr=None → 모든 값 1)
+        # 무방향 그래프는 symmetric=True 일 때만 양방향을 채움 (이때는 새 행렬)
+        n = len(self.node_keys)
+        data = np.ones(len(self.indices), dtype=np.float32) if attr is None else self.edge_attrs[attr]
+        matrix = sparse.csr_matrix((data, self.indices, self.indptr), shape=(n, n), copy=False)
+        if symmetric and not self.directed:
+            matrix = (matrix + matrix.T).tocsr()
+        return matrix
+
+    def _edge_data(self, k):
+        data = {}
+        for name, values in self.edge_attrs.items():
+            value = values[k]
+            if name == "type":
+                if value >= 0:
+                    data[name] = EDGE_TYPES[value]
+            elif not (isinstance(value, np.floating) and np.isnan(value)):
+                data[name] = _py(value)
+        return data
+
+    def _node_data(self, k):
+        return {name: _py(values[k]) for name, values in self.node_attrs.items() if values[k] is not None}
+
+    # networkx 와 같은 읽기 전용 순회 (시각화, 출력용). 엣지 dict 는 순회할 때만 만듦
+    def nodes(self, data=False):
+        for k, node in enumerate(self.node_keys):
+            yield (node, self._node_data(k)) if data else node
+
+    def edges(self, data=False):
+        src, dst = self.edge_arrays()
+        keys = self.node_keys
+        for k, (a, b) in enumerate(zip(src.tolist(), dst.tolist())):
+            yield (keys[a], keys[b], self._edge_data(k)) if data else (keys[a], keys[b])
+
+    def to_networkx(self):
+        G = nx.DiGraph() if self.directed else nx.Graph()
+        G.add_nodes_from(self.nodes(data=True))
+        G.add_edges_from(self.edges(data=True))
+        return G
+
+    def save(self, path):
+        # path.npz: CSR 구조 + 엣지 속성 배열, path.nodes.json: node 이름과 node 속성
+        np.savez(path + ".npz", indptr=self.indptr, indices=self.indices,
+                 **{f"edge_{name}": values for name, values in self.edge_attrs.items()})
+        with open(path + ".nodes.json", "w", encoding="utf-8") as f:
+            node_attrs = {name: values.tolist() if isinstance(values, np.ndarray) else list(values)
+                          for name, values in self.node_attrs.items()}
+            json.dump({"directed": self.directed, "nodes": self.node_keys, "node_attrs": node_attrs},
+                      f, ensure_ascii=False, default=_json_default)
+
+    @classmethod
+    def load(cls, path):
+        with open(path + ".nodes.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with np.load(path + ".npz") as arrays:
+            edge_attrs = {name[len("edge_"):]: arrays[name] for name in arrays.files if name.startswith("edge_")}
+            return cls(meta["nodes"], arrays["indptr"], arrays["indices"], edge_attrs, meta["node_attrs"], meta["directed"])
+
+def as_array_graph(G):
+    return G if isinstance(G, ArrayGraph) else ArrayGraph.from_networkx(G)
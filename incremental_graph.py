@@ -0,0 +1,95 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import networkx as nx
+from relation_matrix import build_action_features, score_pairs, pair_relation, append_relation
+from build_rst_graph import build_rst_graph, assign_local_groups
+from infer_causal_paths import infer_causal_paths
+from build_combined_graph import build_combined_graph
+from build_rdf_graph import add_file_to_rdf_graph
+from timestamps import add_action_times
+from graph_core import ArrayGraph, as_array_graph
+
+GRAPH_NAMES = ("rst", "causal", "combined", "rdf")
+# rst/causal/combined 는 ArrayGraph 압축 파일 (CSR .npz + node .json), RDF 는 문자열 node 라 node-link JSON
+ARRAY_GRAPHS = ("rst", "causal", "combined")
+
+def _json_default(value):
+    # numpy scalar → python 값, 그 외는 문자열
+    return value.item() if hasattr(value, "item") else str(value)
+
+def save_graphs(graphs, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for name, G in graphs.items():
+        if name in ARRAY_GRAPHS:
+            as_array_graph(G).save(os.path.join(out_dir, name))
+            continue
+        with open(os.path.join(out_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(nx.node_link_data(G, edges="edges"), f, ensure_ascii=False, default=_json_default)
+    print(f"💾 Graphs saved to: {out_dir} ({', '.join(graphs)})")
+
+def load_graphs(out_dir):
+    # rst/causal/combined 는 ArrayGraph, RDF 는 networkx 로 불러옴. 저장된 그래프가 하나라도 없으면 None (→ 전체 재구성)
+    graphs = {}
+    for name in GRAPH_NAMES:
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path + (".npz" if name in ARRAY_GRAPHS else ".json")):
+            return None
+        if name in ARRAY_GRAPHS:
+            graphs[name] = ArrayGraph.load(path)
+            continue
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            graphs[name] = nx.node_link_graph(json.load(f), edges="edges")
+    return graphs
+
+def new_action_pairs(n_old, n):
+    # 새 action (위치 n_old..n-1) 각각 × 그보다 앞 위치의 모든 action → (lo, hi), lo < hi
+    counts = np.arange(n_old, n, dtype=np.int64)
+    hi = np.repeat(counts, counts)
+    lo = np.arange(len(hi), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    return lo, hi
+
+def _update_groups(G, new_nodes):
+    # 전체 재구성 때 community 를 계산해 둔 경우 (GRAPH_COMMUNITY_GROUPS) 에만 새 node 를 국소 배정
+    if any(group is not None for group in G.node_attrs.get("group", [])):
+        assign_local_groups(G, new_nodes)
+
+def add_files_to_graph(G, new_files, folder_path):
+    # 새 파일 (action 이 없는 파일 포함) 을 RDF 그래프에 추가
+    folder_node = f"folder:{os.path.basename(folder_path or '')}"
+    for file in new_files:
+        add_file_to_rdf_graph(G, folder_node, file)
+
+def add_actions_to_graphs(new_df, shard_df, relation, graphs, rst_threshold, causal_threshold, weights=None,
+                          rst_weights=None, max_gap=None, model=None, cache=None):
+    # 새 action 을 기존 node 와만 점수화해 (O(new × existing)) RST/causal/combined 그래프에 반영
+    # 새 쌍은 relation 뒤에 segment 로 덧붙이고, 그 segment 만으로 전체 재구성과 같은 builder 를 돌려 새 엣지를 덧붙임
+    n_old = len(shard_df)
+    start = int(max(shard_df.index)) + 1 if n_old else 0
+    new_df = new_df.copy()
+    new_df.index = range(start, start + len(new_df))
+    shard_df = pd.concat([shard_df, new_df])
+    add_action_times(shard_df)
+    index = list(shard_df.index)
+    new_nodes = index[n_old:]
+
+    features = build_action_features(shard_df, model, cache)
+    lo, hi = new_action_pairs(n_old, len(shard_df))
+    new_pairs = pair_relation(lo, hi, score_pairs(features, lo, hi), index)
+    relation = append_relation(relation, new_pairs)
+
+    # 새 쌍에서 나온 엣지만 담은 그래프 → 기존 그래프에 덧붙임 (새 쌍은 항상 새 node 를 포함하므로 기존 엣지와 겹치지 않음)
+    rst_new = build_rst_graph(shard_df, rst_threshold, relation=new_pairs, weights=rst_weights)
+    causal_new = infer_causal_paths(shard_df, causal_threshold, weights=weights, relation=new_pairs,
+                                    rst_weights=rst_weights, max_gap=max_gap)
+    combined_new = build_combined_graph(rst_new, causal_new, relation=new_pairs)
+    for name, delta in (("rst", rst_new), ("causal", causal_new), ("combined", combined_new)):
+        G = as_array_graph(graphs[name]).extend(delta)
+        nodes = set(G.node_keys)
+        _update_groups(G, [node for node in new_nodes if node in nodes])
+        graphs[name] = G
+
+    print(f"🧩 Incremental update: {len(new_nodes)} new actions scored against {n_old} existing "
+          f"({len(lo)} pairs) → +{rst_new.number_of_edges()} RST, +{causal_new.number_of_edges()} causal edges")
+    return relation, shard_df, graphs
@@ -1,53 +1,107 @@
+import numpy as np
+from relation_score_utils import compute_rst_score, compute_csim_score
+from relation_matrix import build_action_features, score_pairs, iter_relation_chunks, COMPONENTS
+from timestamps import MISSING_EPOCH, add_action_times
+from graph_core import ArrayGraph, EDGE_TYPES
 
-import networkx as nx
-from dateutil.parser import parse
-from sentence_transformers import SentenceTransformer
-from relation_score_utils import compute_relation_components, compute_rst_score, compute_csim_score
-from datetime import timezone
-
-
-def safe_parse(x):
-    try:
-        dt = parse(str(x))
-        if dt.tzinfo is None:
-            # ✅ timezone-naive인 경우 UTC로 설정
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt
-    except:
-        return None
-
-def infer_causal_paths(shard_df, threshold=0.27, weights=None):
-    model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-    shard_df["parsed_time"] = shard_df["T_A"].fillna(shard_df["T_S"]).apply(safe_parse)
-
-    G = nx.DiGraph()
-    for i, row in shard_df.iterrows():
-        G.add_node(i, **row.to_dict())
-
-    for i in range(len(shard_df)):
-        for j in range(len(shard_df)):
-            if i == j:
-                continue
-
-            ti, tj = shard_df.loc[i, "parsed_time"], shard_df.loc[j, "parsed_time"]
-            if not ti or not tj:
-                print(f"⏳ Skip: Missing time on {i} or {j}")
-                continue
-            if ti >= tj:
-                print(f"🕒 Skip: {i} ({ti}) !< {j} ({tj})")
-                continue
-
-            shard_i = shard_df.iloc[i]
-            shard_j = shard_df.iloc[j]
-
-            f_I, f_S, f_C, f_M = compute_relation_components(shard_i, shard_j, model)
-            rst_score = compute_rst_score(f_I, f_S, f_C, f_M)
-            score = compute_csim_score(f_I, f_S, f_C, f_M, rst_score, weights)
-
-            if score >= threshold:
-                print(f"🔥 ADD EDGE: {i} → {j} | score={score:.2f}")
-                G.add_edge(i, j, weight=round(score, 3), type="causal")
-            else:
-                print(f"❌ SKIP EDGE: {i} → {j} | score={score:.2f}")
-
-    return G
+# causal graph node 에 남길 action 열 (row 전체를 복사하지 않음)
+CAUSAL_NODE_COLUMNS = ("A", "T_A", "ID", "T_epoch")
+
+
+def forward_pairs(times, max_gap=None, chunk_pairs=1000000):
+    # times: epoch ms (int64, MISSING_EPOCH = 시각 없음), max_gap 도 ms
+    # 한 번 정렬하고, 각 action 이후 (max_gap 이내) action 들만 쌍으로 생성
+    valid = np.flatnonzero(times != MISSING_EPOCH)
+    order = valid[np.argsort(times[valid], kind="stable")]
+    sorted_t = times[order]
+    start = np.searchsorted(sorted_t, sorted_t, side="right")
+    if max_gap is None:
+        end = np.full(len(order), len(order))
+    else:
+        end = np.searchsorted(sorted_t, sorted_t + max_gap, side="right")
+    counts = end - start
+    cum = np.cumsum(counts)
+
+    s = 0
+    while s < len(order):
+        base = cum[s - 1] if s else 0
+        e = max(s + 1, int(np.searchsorted(cum, base + chunk_pairs, side="right")))
+        c = counts[s:e]
+        if c.sum():
+            first = np.repeat(np.cumsum(c) - c, c)
+            dst = np.repeat(start[s:e], c) + (np.arange(c.sum()) - first)
+            yield order[np.repeat(np.arange(s, e), c)], order[dst]
+        s = e
+
+def _score_causal(comp, threshold, weights, rst_weights):
+    rst_score = compute_rst_score(comp["f_I"], comp["f_S"], comp["f_C"], comp["f_M"], rst_weights)
+    score = compute_csim_score(comp["f_I"], comp["f_S"], comp["f_C"], comp["f_M"], rst_score, weights)
+    return score, score >= threshold
+
+def orient_pairs(times, pi, pj, components, gap=None):
+    # 성분은 대칭 → 시간이 앞선 쪽에서 뒤쪽으로 방향을 정함 (시각이 없거나 같은 쌍, 창 밖의 쌍은 제외)
+    ti, tj = times[pi], times[pj]
+    sel = np.flatnonzero((ti != MISSING_EPOCH) & (tj != MISSING_EPOCH) & (ti != tj))
+    out_of_window = 0
+    if gap is not None:
+        in_window = np.abs(tj[sel] - ti[sel]) <= gap
+        out_of_window = int((~in_window).sum())
+        sel = sel[in_window]
+    forward = ti[sel] < tj[sel]
+    src = np.where(forward, pi[sel], pj[sel])
+    dst = np.where(forward, pj[sel], pi[sel])
+    return src, dst, {name: components[name][sel] for name in COMPONENTS}, out_of_window
+
+def infer_causal_paths(shard_df, threshold=0.27, weights=None, relation=None, rst_weights=None, max_gap=None):
+    # → ArrayGraph (방향). action store 에 저장된 epoch 를 재사용하고, 없는 row 만 한 번에 정규화
+    add_action_times(shard_df)
+
+    index = list(shard_df.index)
+    times = shard_df["T_epoch"].to_numpy(np.int64)
+    gap = None if max_gap is None else int(max_gap * 1000)
+    stats = {"missing_time": int((times == MISSING_EPOCH).sum()), "evaluated": 0, "out_of_window": 0, "below_threshold": 0, "added": 0}
+
+    edges = {"src": [], "dst": [], "weight": []}
+
+    def add_edges(src, dst, score, keep):
+        edges["src"].append(src[keep])
+        edges["dst"].append(dst[keep])
+        edges["weight"].append(np.round(score[keep].astype(np.float64), 3).astype(np.float32))
+        stats["evaluated"] += len(src)
+        stats["added"] += int(keep.sum())
+        stats["below_threshold"] += int((~keep).sum())
+
+    if relation is None:
+        # 전체 relation 없이 시간 창 안의 forward 쌍만 점수화
+        features = build_action_features(shard_df)
+        for src, dst in forward_pairs(times, gap):
+            score, keep = _score_causal(score_pairs(features, src, dst), threshold, weights, rst_weights)
+            add_edges(src, dst, score, keep)
+    else:
+        for _, pi, pj, chunk in iter_relation_chunks(relation):
+            src, dst, comp, out_of_window = orient_pairs(times, pi, pj, chunk, gap)
+            stats["out_of_window"] += out_of_window
+            score, keep = _score_causal(comp, threshold, weights, rst_weights)
+            add_edges(src, dst, score, keep)
+
+    print(f"🕒 Causal inference: {stats['evaluated']} forward pairs scored, {stats['added']} edges added, "
+          f"{stats['below_threshold']} below threshold, {stats['out_of_window']} outside window, "
+          f"{stats['missing_time']} actions without time")
+
+    # node 에는 row 전체 대신 필요한 열만 (열 단위로 한 번에)
+    src, dst, weight = (np.concatenate(edges[k]) if edges[k] else np.empty(0) for k in ("src", "dst", "weight"))
+    return ArrayGraph.from_edges(
+        index, src, dst,
+        edge_attrs={"weight": weight.astype(np.float32),
+                    "type": np.full(len(src), EDGE_TYPES.index("causal"), dtype=np.int8)},
+        node_attrs=causal_node_attrs(shard_df)
+    )
+
+def causal_node_attrs(shard_df):
+    # → {열 이름: node 순서의 값 목록}. 값이 없으면 None
+    columns = {}
+    for name in CAUSAL_NODE_COLUMNS:
+        if name in shard_df.columns:
+            values = shard_df[name].tolist()
+            columns[name] = [None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in values]
+    return columns
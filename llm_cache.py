@@ -0,0 +1,92 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+class ReplayMiss(Exception):
+    pass
+
+def content_hash(text):
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+class LLMCache:
+    # (model, prompt template version, temperature, sha256(content)) → 원본 응답 문자열
+    def __init__(self, path, max_entries=200000, replay_only=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.replay_only = replay_only
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                template_version TEXT NOT NULL,
+                temperature REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses (last_used)")
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(model, template_version, temperature, content):
+        return content_hash(f"{model}|{template_version}|{float(temperature)}|{content_hash(content)}")
+
+    def get(self, model, template_version, temperature, content):
+        key = self.make_key(model, template_version, temperature, content)
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model, template_version, temperature, content, response):
+        key = self.make_key(model, template_version, temperature, content)
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, template_version, float(temperature), content_hash(content), response, now, now)
+            )
+            count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.max_entries:
+                # 가장 오래 사용되지 않은 응답부터 제거
+                excess = count - self.max_entries
+                self.conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "replay_only": self.replay_only
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,128 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import openai
+    RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                        openai.InternalServerError)
+except ImportError:
+    RETRYABLE_ERRORS = (ConnectionError, TimeoutError)
+
+def estimate_tokens(text):
+    # 대략 4 chars ≈ 1 token
+    return max(1, len(str(text)) // 4)
+
+class RateLimiter:
+    # 분당 요청 수 / 토큰 수 token bucket (None 이면 제한 없음)
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.request_allowance = float(requests_per_minute or 0)
+        self.token_allowance = float(tokens_per_minute or 0)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last
+        self.last = now
+        if self.rpm:
+            self.request_allowance = min(self.rpm, self.request_allowance + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_allowance = min(self.tpm, self.token_allowance + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0):
+        while True:
+            with self.lock:
+                self._refill()
+                tokens = min(tokens, self.tpm) if self.tpm else tokens
+                request_ok = not self.rpm or self.request_allowance >= 1
+                token_ok = not self.tpm or self.token_allowance >= tokens
+                if request_ok and token_ok:
+                    if self.rpm:
+                        self.request_allowance -= 1
+                    if self.tpm:
+                        self.token_allowance -= tokens
+                    return
+                wait = 0.0
+                if not request_ok:
+                    wait = max(wait, (1 - self.request_allowance) * 60 / self.rpm)
+                if not token_ok:
+                    wait = max(wait, (tokens - self.token_allowance) * 60 / self.tpm)
+            time.sleep(wait)
+
+class ExtractionScheduler:
+    def __init__(self, concurrency=8, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.concurrency = max(1, concurrency)
+        # map() 이 여러 ingest worker 에서 동시에 불려도 진행 중인 요청은 전체 concurrency 개까지
+        self.slots = threading.BoundedSemaphore(self.concurrency)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.tokens = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.lock = threading.Lock()
+
+    def call(self, fn, est_tokens=0):
+        # rate limit 을 지키며 fn() 실행, 일시적 오류는 exponential backoff + jitter 로 재시도
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(est_tokens)
+            with self.lock:
+                self.requests += 1
+                self.tokens += est_tokens
+            try:
+                with self.slots:
+                    return fn()
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    with self.lock:
+                        self.failures += 1
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                with self.lock:
+                    self.retries += 1
+                print(f"🔁 Retry {attempt + 1}/{self.max_retries} in {delay:.1f}s: {e}")
+                time.sleep(delay)
+
+    def map(self, fn, items):
+        # 입력 순서대로 결과를 돌려줌. 개별 실패는 None 으로 격리
+        items = list(items)
+        if self.concurrency == 1 or len(items) <= 1:
+            return [self._safe(fn, item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as pool:
+            return list(pool.map(lambda item: self._safe(fn, item), items))
+
+    def record_usage(self, usage):
+        # 응답의 실제 토큰 사용량 (서버가 보고하는 경우)
+        if usage is None:
+            return
+        with self.lock:
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+
+    @staticmethod
+    def _safe(fn, item):
+        try:
+            return fn(item)
+        except Exception as e:
+            print(f"❌ Extraction task failed: {e}")
+            return None
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "estimated_tokens": self.tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens
+        }
@@ -0,0 +1,93 @@
+import re
+import ipaddress
+
+# 메타데이터 필드별 규칙 기반 추출기: (이름, 정규식, 검증/정규화 함수)
+# 검증 함수는 정규화된 값 또는 None(불일치) 을 돌려줌. 규칙은 등록 순서대로 시도
+METADATA_RULES = {}
+
+def register_metadata_rule(field, name, pattern, validate=None, group=0):
+    regex = re.compile(pattern) if isinstance(pattern, str) else pattern
+    METADATA_RULES.setdefault(field, []).append((name, regex, validate or (lambda v: v), group))
+
+def luhn_valid(digits):
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        n = int(d)
+        if i % 2 == 1:
+            n = n * 2 - 9 if n > 4 else n * 2
+        total += n
+    return total % 10 == 0
+
+def validate_ipv4(value):
+    try:
+        ip = ipaddress.IPv4Address(value)
+    except ValueError:
+        return None
+    return None if ip.is_unspecified or ip.is_reserved else str(ip)
+
+def validate_ipv6(value):
+    try:
+        ip = ipaddress.IPv6Address(value)
+    except ValueError:
+        return None
+    return None if ip.is_unspecified or ip.is_loopback else str(ip)
+
+# 카드사 IIN 접두어별 허용 길이 (Visa, Mastercard, Amex, Discover, JCB, UnionPay)
+CARD_NETWORKS = [
+    (re.compile(r"4"), (13, 16, 19)),
+    (re.compile(r"5[1-5]|2(?:2[2-9]|[3-6]\d|7[01]|720)"), (16,)),
+    (re.compile(r"3[47]"), (15,)),
+    (re.compile(r"6(?:011|5|4[4-9])"), (16, 17, 18, 19)),
+    (re.compile(r"35"), (16, 17, 18, 19)),
+    (re.compile(r"62"), (16, 17, 18, 19))
+]
+
+def validate_card(value):
+    digits = re.sub(r"[ -]", "", value)
+    if not luhn_valid(digits):
+        return None
+    for prefix, lengths in CARD_NETWORKS:
+        if prefix.match(digits) and len(digits) in lengths:
+            return digits
+    return None
+
+def validate_imei(value):
+    digits = re.sub(r"[ -]", "", value)
+    return digits if len(digits) == 15 and luhn_valid(digits) else None
+
+def validate_bare_imei(value):
+    # 키워드 없는 15자리 숫자는 흔한 TAC 접두어만 IMEI 로 인정
+    return validate_imei(value) if value[:2] in ("35", "86", "01", "99") else None
+
+register_metadata_rule("ip_address", "ipv4", r"(?<![\d.])(?:\d{1,3}\.){3}\d{1,3}(?![\d.])", validate_ipv4)
+register_metadata_rule("ip_address", "ipv6", r"(?<![\w:])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![\w:])", validate_ipv6)
+register_metadata_rule("card_number", "luhn", r"(?<![\d-])(?:\d[ -]?){12,18}\d(?![\d-])", validate_card)
+register_metadata_rule("device_id", "imei", r"(?i)\bIMEI\s*(?:no\.?|number)?\s*[:=#]?\s*(\d{15}|\d{2}-\d{6}-\d{6}-\d)\b", validate_imei, group=1)
+register_metadata_rule("device_id", "uuid", r"(?i)\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", str.lower)
+register_metadata_rule("device_id", "imei", r"(?<!\d)\d{15}(?!\d)", validate_bare_imei)
+register_metadata_rule("user_id", "email", r"\b[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}\b")
+register_metadata_rule("user_id", "key-value", r"(?i)\b(?:user(?:name|_?id)?|login|account)\s*[:=]\s*[\"']?([\w.@-]{2,64})", group=1)
+
+class MetadataRuleScanner:
+    # 텍스트를 조각 단위로 받아 필드별 첫 유효값을 찾음. 모든 필드를 찾으면 이후 입력은 무시
+    def __init__(self, fields=None):
+        self.fields = [f for f in (fields or METADATA_RULES) if f in METADATA_RULES]
+        self.values = {}
+        self.sources = {}
+
+    @property
+    def done(self):
+        return len(self.values) == len(self.fields)
+
+    def feed(self, text):
+        if self.done or not text:
+            return
+        for field in self.fields:
+            if field in self.values:
+                continue
+            for name, regex, validate, group in METADATA_RULES[field]:
+                value = next((v for v in map(validate, (m.group(group) for m in regex.finditer(text))) if v), None)
+                if value:
+                    self.values[field] = value
+                    self.sources[field] = f"rule:{name}"
+                    break
@@ -0,0 +1,129 @@
+import re
+import json
+import ipaddress
+import numpy as np
+from scipy import sparse
+from config import METADATA_FIELD_WEIGHTS, IP_SUBNET_SIMILARITY, ADDRESS_MIN_SIMILARITY
+
+# 필드별 구조적 비교: device_id / user_id / card_number 는 정규화 후 exact,
+# ip_address 는 exact + 같은 subnet (IPv4 /24, IPv6 /64) 부분 점수, address 만 문자 trigram Jaccard (fuzzy)
+# 각 필드는 (action × 정규화 값) incidence 행렬 → 공유 값 inverted index 가 곧 sparse 행렬곱
+NULL_VALUES = ("", "none", "null", "nan", "n/a", "unknown")
+EXACT_FIELDS = ("device_id", "user_id", "card_number", "ip_address", "ip_subnet")
+ADDRESS_NOISE = re.compile(r"[^\w]+")
+
+def parse_metadata(value):
+    if isinstance(value, dict):
+        return value
+    try:
+        meta = json.loads(value) if isinstance(value, str) else {}
+    except (TypeError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+def _values(raw):
+    values = raw if isinstance(raw, (list, tuple, set)) else [raw]
+    return [str(v).strip() for v in values if v is not None and str(v).strip().lower() not in NULL_VALUES]
+
+def normalize_device_id(value):
+    return re.sub(r"[\s:-]", "", value).lower() or None
+
+def normalize_user_id(value):
+    value = value.lower()
+    return value[len("mailto:"):] if value.startswith("mailto:") else value
+
+def normalize_card_number(value):
+    digits = re.sub(r"\D", "", value)
+    return digits if 12 <= len(digits) <= 19 else None
+
+def normalize_ip(value):
+    try:
+        return ipaddress.ip_address(value.strip("[]"))
+    except ValueError:
+        return None
+
+def ip_subnet(ip):
+    prefix = 24 if ip.version == 4 else 64
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+def normalize_address(value):
+    return " ".join(ADDRESS_NOISE.sub(" ", value.lower()).split())
+
+def address_trigrams(value):
+    text = f" {normalize_address(value)} "
+    return {text[k:k + 3] for k in range(len(text) - 2)} if len(text) > 3 else set()
+
+def metadata_keys(meta):
+    # → {field: set(정규화 값)}. blocking 키와 exact-match index 가 같은 정규화를 씀
+    meta = parse_metadata(meta)
+    keys = {field: set() for field in EXACT_FIELDS}
+    normalizers = {"device_id": normalize_device_id, "user_id": normalize_user_id,
+                   "card_number": normalize_card_number}
+    for field, normalize in normalizers.items():
+        keys[field].update(v for v in map(normalize, _values(meta.get(field))) if v)
+    for ip in filter(None, map(normalize_ip, _values(meta.get("ip_address")))):
+        keys["ip_address"].add(str(ip))
+        keys["ip_subnet"].add(ip_subnet(ip))
+    return keys
+
+def _incidence(rows_of_keys, n):
+    vocab, rows, cols = {}, [], []
+    for r, key_set in enumerate(rows_of_keys):
+        for key in key_set:
+            rows.append(r)
+            cols.append(vocab.setdefault(key, len(vocab)))
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, max(len(vocab), 1)))
+
+def build_metadata_index(values):
+    # values: action 별 M (JSON 문자열 또는 dict) → 필드별 incidence 행렬 + 필드 가중치
+    metas = [parse_metadata(v) for v in values]
+    n = len(metas)
+    keys = [metadata_keys(m) for m in metas]
+    weights = dict(METADATA_FIELD_WEIGHTS)
+    ip_weight = weights.pop("ip_address", 0.0)
+    # ip 점수 = IP_SUBNET_SIMILARITY (같은 subnet) + 나머지 (같은 주소) → 두 exact 항의 선형 합
+    weights["ip_subnet"] = ip_weight * IP_SUBNET_SIMILARITY
+    weights["ip_address"] = ip_weight * (1.0 - IP_SUBNET_SIMILARITY)
+
+    index = {"n": n, "weights": weights, "fields": {}}
+    for field in EXACT_FIELDS:
+        if weights.get(field):
+            index["fields"][field] = _incidence([k[field] for k in keys], n)
+    if weights.get("address"):
+        trigrams = [set().union(*map(address_trigrams, _values(m.get("address")))) for m in metas]
+        index["address"] = _incidence(trigrams, n)
+        index["address_size"] = np.asarray(index["address"].sum(axis=1)).ravel()
+    return index
+
+def _address_score(inter, size_a, size_b):
+    union = size_a + size_b - inter
+    score = np.divide(inter, union, out=np.zeros(len(inter), dtype=np.float32), where=union > 0)
+    return np.where(score >= ADDRESS_MIN_SIMILARITY, score, 0.0).astype(np.float32)
+
+def metadata_pair_scores(index, i, j):
+    # 지정된 쌍들의 f_M (행 단위 element-wise 곱, 쌍 수에 선형)
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    score = np.zeros(len(i), dtype=np.float32)
+    for field, X in index["fields"].items():
+        shared = np.asarray(X[i].multiply(X[j]).sum(axis=1)).ravel()
+        score += index["weights"][field] * (shared > 0)
+    if "address" in index:
+        inter = np.asarray(index["address"][i].multiply(index["address"][j]).sum(axis=1)).ravel()
+        score += index["weights"]["address"] * _address_score(inter, index["address_size"][i], index["address_size"][j])
+    return score
+
+def metadata_similarity_block(index, r0, r1):
+    # 행 r0:r1 × 전체 action 의 f_M (sparse). 값을 공유하는 쌍만 nonzero
+    block = sparse.csr_matrix((r1 - r0, index["n"]), dtype=np.float32)
+    for field, X in index["fields"].items():
+        shared = (X[r0:r1] @ X.T).tocsr()
+        shared.data = np.full(len(shared.data), index["weights"][field], dtype=np.float32)
+        block = block + shared
+    if "address" in index:
+        inter = (index["address"][r0:r1] @ index["address"].T).tocoo()
+        score = _address_score(inter.data, index["address_size"][inter.row + r0], index["address_size"][inter.col])
+        block = block + sparse.csr_matrix((index["weights"]["address"] * score, (inter.row, inter.col)),
+                                          shape=block.shape)
+    block.eliminate_zeros()
+    return block.tocsr()
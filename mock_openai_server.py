@@ -0,0 +1,115 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 오프라인 실행/테스트용 OpenAI 호환 /v1/chat/completions 서버
+# 사용: python mock_openai_server.py --port 8765 --latency 0.2
+#       OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python CAREN.py
+
+ISO_TIME = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2})?")
+IPV4 = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+
+class MockState:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.lock = threading.Lock()
+
+def _content_of(prompt):
+    return prompt.split("Content:", 1)[-1].strip()
+
+def _mock_shard(content):
+    lines = [line.strip() for line in content.splitlines() if line.strip()]
+    first = lines[0] if lines else ""
+    ts = ISO_TIME.search(content)
+    return {"A": f"Recorded activity: {first[:80]}", "T_A": ts.group(0) if ts else None, "C": " ".join(lines)[:200]}
+
+def _mock_metadata(content):
+    ip = IPV4.search(content)
+    return {"device_id": None, "user_id": None, "address": None, "card_number": None,
+            "ip_address": ip.group(0) if ip else None}
+
+def mock_reply(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    if "### row" in prompt:
+        rows = re.findall(r"### row (\d+)\n(.*?)(?=\n\n### row |\Z)", prompt.split("Rows:", 1)[-1], re.S)
+        return json.dumps([{"row": int(row_id), **_mock_shard(text)} for row_id, text in rows], ensure_ascii=False)
+    content = _content_of(prompt)
+    if '"metadata":' in prompt:
+        return json.dumps({**_mock_shard(content), "metadata": _mock_metadata(content)}, ensure_ascii=False)
+    if "Extract values for the following keys" in prompt:
+        return json.dumps(_mock_metadata(content))
+    return json.dumps(_mock_shard(content), ensure_ascii=False)
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            messages = body.get("messages", [])
+            prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+
+            with state.lock:
+                state.requests += 1
+                state.prompt_tokens += prompt_tokens
+            time.sleep(max(0.0, state.latency + random.uniform(-state.jitter, state.jitter)))
+
+            if random.random() < state.error_rate:
+                self._send(429, {"error": {"message": "mock rate limit", "type": "rate_limit_error"}})
+                return
+
+            reply = mock_reply(messages)
+            self._send(200, {
+                "id": f"mock-{state.requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(reply) // 4,
+                          "total_tokens": prompt_tokens + len(reply) // 4}
+            })
+
+        def _send(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def start_mock_server(host="127.0.0.1", port=8765, latency=0.0, jitter=0.0, error_rate=0.0):
+    state = MockState(latency, jitter, error_rate)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_mock_server(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    print(f"🧪 Mock OpenAI server on http://{args.host}:{server.server_port}/v1")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"📊 requests={server.state.requests}, prompt_tokens={server.state.prompt_tokens}")
+        server.shutdown()
@@ -4,14 +4,32 @@ import json
 import uuid
 import getpass
 from pathlib import Path
+import time
+import hashlib
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from file_parser import parse_file_by_extension
+from config import INGEST_WORKERS
+from action_store import ActionStoreWriter, iter_file_blocks, read_folder_info
 
-def extract_file_metadata(file_path, folder_id):
+def file_content_hash(file_path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def stable_file_id(file_path, content_sha):
+    # 같은 경로 + 같은 내용이면 실행마다 같은 fileID
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{Path(file_path).as_posix()}:{content_sha}"))
+
+def extract_file_metadata(file_path, folder_id, content_sha=None):
+    content_sha = content_sha or file_content_hash(file_path)
     parsed_result = parse_file_by_extension(file_path)
 
     return {
-        "fileID": str(uuid.uuid4()),
+        "fileID": stable_file_id(file_path, content_sha),
+        "contentHash": content_sha,
         "fileName": os.path.basename(file_path),
         "filePath": str(file_path),
         "fileOwner": getpass.getuser(),
@@ -20,28 +38,138 @@ def extract_file_metadata(file_path, folder_id):
         "relation": "isPartOf",
         "parentFolder": folder_id,
         "actions": parsed_result.get("actions", []),
-        "metadata": parsed_result.get("metadata", {})
+        "metadata": parsed_result.get("metadata", {}),
+        "metadataSource": parsed_result.get("metadataSource", {})
     }
 
-def process_folder(folder_path):
-    folder_id = str(uuid.uuid4())
-    folder_data = {
-        "folderID": folder_id,
-        "folderPath": str(folder_path),
-        "folderOwner": getpass.getuser(),
-        "files": []
-    }
+def ingest_file(file_path, folder_id, content_sha=None):
+    # 파일 하나의 실패가 전체 실행을 멈추지 않도록 격리하고, 파일별 처리 시간을 기록
+    start = time.time()
+    try:
+        record = extract_file_metadata(file_path, folder_id, content_sha)
+    except Exception as e:
+        print(f"❌ Failed to ingest {file_path}: {e}")
+        record = {
+            "fileID": stable_file_id(file_path, content_sha or "unreadable"),
+            "fileName": os.path.basename(file_path),
+            "filePath": str(file_path),
+            "relation": "isPartOf",
+            "parentFolder": folder_id,
+            "actions": [],
+            "metadata": {},
+            "error": f"{type(e).__name__}: {e}"
+        }
+    record["parseSeconds"] = round(time.time() - start, 3)
+    return record
 
+def list_folder_files(folder_path):
+    file_paths = []
     for root, dirs, files in os.walk(folder_path):
-        for file_name in files:
-            file_path = Path(root) / file_name
-            file_metadata = extract_file_metadata(file_path, folder_id)
-            folder_data["files"].append(file_metadata)
+        dirs.sort()
+        for file_name in sorted(files):
+            file_paths.append(Path(root) / file_name)
+    return file_paths
+
+def iter_ingest_files(file_paths, folder_id, workers=INGEST_WORKERS, hashes=None):
+    # thread 만 사용: LLM 요청은 프로세스 하나의 llm_scheduler (rate limit, concurrency) 와 LLM 캐시 연결을 공유해야 함
+    hashes = hashes or {}
+    max_pending = max(1, workers) * 2
+
+    # 다음에 내보낼 파일보다 max_pending 개까지만 앞서 제출하고, 결과는 입력 순서대로 yield
+    start = time.time()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        next_submit = 0
+        for next_yield in range(len(file_paths)):
+            while next_submit < len(file_paths) and next_submit < next_yield + max_pending:
+                path = file_paths[next_submit]
+                futures[next_submit] = pool.submit(ingest_file, path, folder_id, hashes.get(str(path)))
+                next_submit += 1
+            record = futures.pop(next_yield).result()
+            failed += bool(record.get("error"))
+            yield record
+
+    print(f"📂 Ingested {len(file_paths)} files in {time.time() - start:.1f}s ({workers} workers, {failed} failed)")
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("files", {})
 
-    return folder_data
+def save_manifest(manifest, manifest_path):
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"files": manifest}, f, indent=2, ensure_ascii=False)
+
+def scan_folder_changes(folder_path, manifest):
+    # size/mtime 이 같으면 해시 생략, 다르면 해시로 실제 변경 여부 확인
+    current, changed = {}, []
+    for file_path in list_folder_files(folder_path):
+        key = str(file_path)
+        st = os.stat(file_path)
+        entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        old = manifest.get(key)
+        if old and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+            entry["sha256"] = old["sha256"]
+        else:
+            entry["sha256"] = file_content_hash(file_path)
+            if not old or old["sha256"] != entry["sha256"]:
+                changed.append(file_path)
+        current[key] = entry
+    deleted = [key for key in manifest if key not in current]
+    return current, changed, deleted
+
+def process_folder_incremental(folder_path, store_path, manifest_path, workers=INGEST_WORKERS):
+    manifest = load_manifest(manifest_path)
+    has_previous = bool(manifest) and os.path.exists(store_path)
+
+    previous_files = {}
+    if has_previous:
+        previous_files = {header["filePath"]: header for header, _ in iter_file_blocks(store_path)}
+    current, changed, deleted = scan_folder_changes(folder_path, manifest if has_previous else {})
+
+    # 이전 실행에서 실패했거나 결과가 없는 파일은 다시 파싱
+    changed_keys = set(map(str, changed))
+    for key in current:
+        if key not in changed_keys and (key not in previous_files or previous_files[key].get("error")):
+            changed_keys.add(key)
+    changed = [Path(key) for key in current if key in changed_keys]
+
+    folder_info = {
+        "folderID": read_folder_info(store_path)["folderID"] if has_previous else str(uuid.uuid4()),
+        "folderPath": str(folder_path),
+        "folderOwner": getpass.getuser()
+    }
 
+    # 이전 store 와 같은 경로 순서로 새 store 작성: 변경 없는 파일은 이전 블록을 그대로 복사,
+    # 변경된 파일은 파싱이 끝나는 대로 순서대로 기록 (삭제된 파일의 블록은 건너뜀)
+    # writer 는 store.tmp 에 쓰고 성공했을 때만 store 를 교체 → 중단(Ctrl-C 포함)되면 이전 store 가 그대로 남음
+    previous_blocks = iter_file_blocks(store_path) if has_previous else iter(())
+    parsed = iter_ingest_files(changed, folder_info["folderID"], workers,
+                               hashes={key: current[key]["sha256"] for key in changed_keys})
+    with ActionStoreWriter(store_path, folder_info) as writer:
+        try:
+            for key in current:
+                if key in changed_keys:
+                    writer.write_file(next(parsed))
+                    continue
+                for header, lines in previous_blocks:
+                    if header["filePath"] == key:
+                        writer.write_raw(lines)
+                        break
+            next(parsed, None)
+        finally:
+            # store 를 교체하기 전에 이전 store 읽기 핸들을 닫음
+            if has_previous:
+                previous_blocks.close()
 
-def save_output(data, output_path):
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    save_manifest(current, manifest_path)
+    print(f"🧾 Manifest: {len(changed)} new/changed, {len(deleted)} deleted, "
+          f"{len(current) - len(changed)} unchanged files → {writer.actions} actions written, "
+          f"{len(current) - len(changed)} file blocks reused")
 
+    # → 파일 경로 목록: new = 이전 store 에 없었거나 실패했던 파일, changed = 내용이 바뀐 파일, deleted = 삭제된 파일
+    replaced = {key for key in changed_keys if key in previous_files and not previous_files[key].get("error")}
+    return {"new": [key for key in current if key in changed_keys and key not in replaced],
+            "changed": [key for key in current if key in replaced], "deleted": deleted}
@@ -0,0 +1,175 @@
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from relation_score_utils import encode_texts, token_incidence_matrix
+from embedding_cache import default_embedding_cache
+from metadata_similarity import build_metadata_index, metadata_pair_scores, metadata_similarity_block
+from config import EMBEDDING_MODEL
+
+COMPONENTS = ("f_I", "f_S", "f_C", "f_M")
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+def _column(shard_df, name):
+    return shard_df[name].tolist() if name in shard_df.columns else [""] * len(shard_df)
+
+def build_action_features(shard_df, model=None, cache=None, batch_size=64):
+    model = model or get_model()
+    cache = cache if cache is not None else default_embedding_cache(model)
+
+    id_tokens = token_incidence_matrix(_column(shard_df, "ID"))
+    features = {
+        "index": list(shard_df.index),
+        "ID": id_tokens,
+        "ID_size": np.asarray(id_tokens.sum(axis=1)).ravel(),
+        "A": encode_texts(_column(shard_df, "A"), model, batch_size, cache),
+        "C": encode_texts(_column(shard_df, "C"), model, batch_size, cache),
+        "M": build_metadata_index(_column(shard_df, "M")),
+    }
+    if cache is not None:
+        print(f"🗄️ Embedding cache: {cache.stats()}")
+    return features
+
+def _jaccard(inter, size_a, size_b):
+    union = size_a + size_b - inter
+    return np.divide(inter, union, out=np.zeros_like(inter, dtype=np.float32), where=union > 0).astype(np.float32)
+
+def identity_block(features, r0, r1, max_postings=None):
+    # 행 r0:r1 × 전체 action 의 f_I: ID 토큰 postings 를 공유하는 쌍만 (row, col, jaccard) 로 반환
+    # max_postings 보다 많은 action 이 가진 토큰은 건너뜀 (blocking 용)
+    X = features["ID"]
+    if max_postings is not None:
+        postings = np.diff(X.tocsc().indptr)
+        X = X[:, np.flatnonzero(postings <= max_postings)]
+    inter = (X[r0:r1] @ X.T).tocoo()
+    rows = inter.row.astype(np.int64) + r0
+    cols = inter.col.astype(np.int64)
+    return rows, cols, _jaccard(inter.data, features["ID_size"][rows], features["ID_size"][cols])
+
+def identity_pairs(features, max_postings=None):
+    # ID 토큰을 공유하는 (i < j) 쌍 → candidate blocking 키
+    n = len(features["index"])
+    rows, cols, _ = identity_block(features, 0, n, max_postings)
+    keep = rows < cols
+    return rows[keep], cols[keep]
+
+def score_pairs(features, i, j, chunk=200000):
+    i = np.asarray(i, dtype=np.int64)
+    j = np.asarray(j, dtype=np.int64)
+    out = {name: np.empty(len(i), dtype=np.float32) for name in COMPONENTS}
+
+    for start in range(0, len(i), chunk):
+        a, b = i[start:start + chunk], j[start:start + chunk]
+        sl = slice(start, start + len(a))
+        inter = np.asarray(features["ID"][a].multiply(features["ID"][b]).sum(axis=1)).ravel()
+        out["f_I"][sl] = _jaccard(inter, features["ID_size"][a], features["ID_size"][b])
+        out["f_S"][sl] = np.einsum("ij,ij->i", features["A"][a], features["A"][b])
+        out["f_C"][sl] = np.einsum("ij,ij->i", features["C"][a], features["C"][b])
+        out["f_M"][sl] = metadata_pair_scores(features["M"], a, b)
+    return out
+
+def _score_all_pairs(features):
+    # 행 블록 단위 행렬곱 후 upper triangle (i < j) 만 남김
+    n = len(features["index"])
+    block = max(1, min(1024, (1 << 24) // max(n, 1)))
+    parts = {name: [] for name in ("i", "j") + COMPONENTS}
+
+    for r0 in range(0, n, block):
+        r1 = min(n, r0 + block)
+        rows, cols = np.nonzero(np.arange(n)[None, :] > np.arange(r0, r1)[:, None])
+        parts["i"].append(rows + r0)
+        parts["j"].append(cols)
+
+        # f_I 는 토큰을 공유하는 쌍만 계산하고 나머지는 0 (행 r 의 쌍은 r+1..n-1 순서로 나열됨)
+        f_I = np.zeros(len(rows), dtype=np.float32)
+        si, sj, sv = identity_block(features, r0, r1)
+        upper = sj > si
+        row_start = np.concatenate([[0], np.cumsum(n - 1 - np.arange(r0, r1))])
+        f_I[row_start[si[upper] - r0] + sj[upper] - si[upper] - 1] = sv[upper]
+        parts["f_I"].append(f_I)
+        for name, key in (("f_S", "A"), ("f_C", "C")):
+            block_sim = features[key][r0:r1] @ features[key].T
+            parts[name].append(block_sim[rows, cols].astype(np.float32))
+        parts["f_M"].append(metadata_similarity_block(features["M"], r0, r1).toarray()[rows, cols])
+
+    return {
+        name: np.concatenate(values) if values else np.empty(0, dtype=np.int64 if name in ("i", "j") else np.float32)
+        for name, values in parts.items()
+    }
+
+def build_relation_matrix(shard_df, model=None, cache=None, pairs=None, features=None):
+    if features is None:
+        features = build_action_features(shard_df, model, cache)
+    n = len(features["index"])
+
+    if pairs is None:
+        scored = _score_all_pairs(features)
+    else:
+        i, j = (np.asarray(p, dtype=np.int64) for p in pairs)
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        keys = np.unique(lo[lo != hi] * n + hi[lo != hi])
+        scored = {"i": keys // n, "j": keys % n, **score_pairs(features, keys // n, keys % n)}
+
+    relation = {"n": n, "index": features["index"]}
+    relation["i"] = scored["i"].astype(np.int64)
+    relation["j"] = scored["j"].astype(np.int64)
+    for name in COMPONENTS:
+        relation[name] = scored[name]
+    print(f"🧮 Relation matrix: {n} actions, {len(relation['i'])} scored pairs")
+    return relation
+
+def relation_segments(relation):
+    # relation 은 (i, j) 키 순서로 정렬된 쌍 segment 의 목록. build_relation_matrix 결과는 segment 하나
+    # (증분 갱신은 새 쌍을 segment 로 덧붙이므로 기존 배열을 복사하지 않음)
+    return relation["segments"] if "segments" in relation else [relation]
+
+def relation_pair_count(relation):
+    return sum(len(segment["i"]) for segment in relation_segments(relation))
+
+def pair_relation(lo, hi, components, index):
+    # 점수화한 쌍 (lo < hi) 을 키 순서로 정렬한 relation (segment 하나)
+    n = len(index)
+    order = np.argsort(lo * n + hi, kind="stable")
+    relation = {"n": n, "index": list(index), "i": lo[order], "j": hi[order]}
+    relation.update({name: np.asarray(components[name], dtype=np.float32)[order] for name in COMPONENTS})
+    return relation
+
+def append_relation(relation, new_pairs):
+    # new_pairs (더 큰 index) 의 segment 를 relation 뒤에 덧붙임 → 새 relation (기존 segment 는 복사하지 않고 공유)
+    segments = [segment for segment in relation_segments(relation) + relation_segments(new_pairs) if len(segment["i"])]
+    return {"n": new_pairs["n"], "index": new_pairs["index"], "segments": segments}
+
+def iter_relation_chunks(relation, chunk=1 << 22):
+    # relation 배열 (메모리 배열 또는 relation_store 의 float16 memmap) 을 쌍 chunk 단위로 순회
+    # chunk 마다 int64 / float32 로 변환하므로 전체 relation 을 한 번에 RAM 에 올리지 않음
+    # chunk 는 segment 경계를 넘지 않으므로 chunk 안의 쌍은 항상 키 순서
+    offset = 0
+    for segment in relation_segments(relation):
+        for start in range(0, len(segment["i"]), chunk):
+            sl = slice(start, start + chunk)
+            yield (offset + start, np.asarray(segment["i"][sl], dtype=np.int64), np.asarray(segment["j"][sl], dtype=np.int64),
+                   {name: np.asarray(segment[name][sl], dtype=np.float32) for name in COMPONENTS})
+        offset += len(segment["i"])
+
+def lookup_components(relation, a, b):
+    # (a, b) 위치쌍 → ({성분 이름: float32 값}, found). 성분은 대칭이므로 순서 무관
+    n = relation["n"]
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    keys = np.minimum(a, b) * n + np.maximum(a, b)
+    values = {name: np.zeros(len(keys), dtype=np.float32) for name in COMPONENTS}
+    found = np.zeros(len(keys), dtype=bool)
+    # chunk 마다 키 범위에 드는 쌍만 searchsorted
+    for _, pi, pj, comp in iter_relation_chunks(relation):
+        rel_keys = pi * n + pj
+        sel = np.flatnonzero((keys >= rel_keys[0]) & (keys <= rel_keys[-1]))
+        p = np.searchsorted(rel_keys, keys[sel])
+        ok = rel_keys[p] == keys[sel]
+        for name in COMPONENTS:
+            values[name][sel[ok]] = comp[name][p[ok]]
+        found[sel[ok]] = True
+    return values, found
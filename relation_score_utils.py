@@ -1,30 +1,46 @@
+import numpy as np
+from scipy import sparse
 
-from sklearn.metrics.pairwise import cosine_similarity
-
-def compute_relation_components(shard_i, shard_j, model):
-    def jaccard_similarity(a, b):
-        set_a = set(str(a).split())
-        set_b = set(str(b).split())
-        if not set_a or not set_b:
-            return 0.0
-        return len(set_a & set_b) / len(set_a | set_b)
-
-    def semantic_similarity(a, b):
-        if not a or not b:
-            return 0.0
-        try:
-            vec_a = model.encode(str(a), convert_to_tensor=True)
-            vec_b = model.encode(str(b), convert_to_tensor=True)
-            return float(cosine_similarity([vec_a], [vec_b])[0][0])
-        except:
-            return 0.0
-
-    f_I = jaccard_similarity(shard_i.get("ID", ""), shard_j.get("ID", ""))
-    f_S = semantic_similarity(shard_i.get("A", ""), shard_j.get("A", ""))
-    f_C = semantic_similarity(shard_i.get("C", ""), shard_j.get("C", ""))
-    f_M = semantic_similarity(shard_i.get("M", ""), shard_j.get("M", ""))
-
-    return f_I, f_S, f_C, f_M
+def encode_texts(values, model, batch_size=64, cache=None):
+    # 빈 값은 zero row → 어떤 쌍과도 유사도 0 (per-pair 경로와 동일)
+    texts = [str(v) if v else None for v in values]
+    unique = sorted({t for t in texts if t is not None})
+
+    dim = model.get_sentence_embedding_dimension()
+    emb = np.zeros((len(texts), dim), dtype=np.float32)
+    if not unique:
+        return emb
+
+    cached = cache.get_many(unique) if cache is not None else {}
+    missing = [t for t in unique if t not in cached]
+    if missing:
+        encoded = np.asarray(model.encode(missing, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+        if cache is not None:
+            cache.put_many(missing, encoded)
+        cached.update(zip(missing, encoded))
+
+    vecs = np.stack([cached[t] for t in unique]).astype(np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    vecs = np.divide(vecs, norms, out=np.zeros_like(vecs), where=norms > 0)
+
+    slot = {t: k for k, t in enumerate(unique)}
+    for row, t in enumerate(texts):
+        if t is not None:
+            emb[row] = vecs[slot[t]]
+    return emb
+
+def token_incidence_matrix(values):
+    # 행 = action, 열 = ID 토큰 (jaccard_similarity 와 같은 split 규칙)
+    token_sets = [set(str(v).split()) for v in values]
+    vocab = {}
+    rows, cols = [], []
+    for r, tokens in enumerate(token_sets):
+        for tok in tokens:
+            rows.append(r)
+            cols.append(vocab.setdefault(tok, len(vocab)))
+
+    n = len(token_sets)
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=(n, max(len(vocab), 1)))
 
 def compute_rst_score(f_I, f_S, f_C, f_M, weights=None):
     weights = weights or {"I": 0.05, "C": 0.3, "S": 0.25, "M": 0.1}
@@ -0,0 +1,111 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from relation_matrix import COMPONENTS, relation_segments, relation_pair_count
+from build_rst_graph import build_rst_graph
+from infer_causal_paths import infer_causal_paths
+from build_combined_graph import build_combined_graph
+
+ACTION_COLUMNS = ["A", "T_A", "T_S", "ID", "C", "M", "T_epoch", "T_quality", "merged_ids", "dup_count"]
+
+def _save_array(path, values):
+    # 임시 파일에 쓴 뒤 교체 → 이전에 load 한 memmap 이 가리키는 파일을 덮어쓰지 않음
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, values)
+    os.replace(path + ".tmp", path)
+
+def _save_segment(segment, seg_dir, index_dtype, dtype):
+    os.makedirs(seg_dir, exist_ok=True)
+    _save_array(os.path.join(seg_dir, "pairs_i.npy"), np.asarray(segment["i"]).astype(index_dtype))
+    _save_array(os.path.join(seg_dir, "pairs_j.npy"), np.asarray(segment["j"]).astype(index_dtype))
+    for name in COMPONENTS:
+        _save_array(os.path.join(seg_dir, f"{name}.npy"), np.asarray(segment[name]).astype(dtype))
+
+def _append_actions(shard_df, path, mode):
+    # 한 줄에 action 하나 (+ "_key" = shard_df index). 같은 _key 가 다시 나오면 load 때 마지막 줄이 우선
+    columns = [c for c in ACTION_COLUMNS if c in shard_df.columns]
+    rows = shard_df[columns].assign(_key=shard_df.index)
+    with open(path, mode, encoding="utf-8") as f:
+        if len(rows):
+            f.write(rows.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n") + "\n")
+
+def _save_meta(relation, out_dir, segments, dtype):
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "n": int(relation["n"]),
+            "index": [int(x) if isinstance(x, (int, np.integer)) else x for x in relation["index"]],
+            "pairs": relation_pair_count(relation),
+            "segments": segments,
+            "dtype": dtype
+        }, f, ensure_ascii=False)
+
+def _read_meta(out_dir):
+    with open(os.path.join(out_dir, "meta.json"), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    # segment 목록이 없는 이전 저장본은 out_dir 바로 아래 segment 하나
+    meta.setdefault("segments", [""])
+    return meta
+
+def _index_dtype(relation):
+    return np.int32 if relation["n"] < np.iinfo(np.int32).max else np.int64
+
+def save_relation_matrix(relation, shard_df, out_dir, dtype="float16"):
+    # 전체 저장: 첫 segment 는 out_dir 바로 아래, 나머지는 segment_<k>/ (이전 증분 segment 는 지움)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = _read_meta(out_dir)["segments"] if os.path.exists(os.path.join(out_dir, "meta.json")) else []
+    segments = relation_segments(relation)
+    names = [f"segment_{k}" if k else "" for k in range(len(segments))]
+    for segment, name in zip(segments, names):
+        _save_segment(segment, os.path.join(out_dir, name), _index_dtype(relation), dtype)
+
+    _append_actions(shard_df, os.path.join(out_dir, "actions.jsonl"), "w")
+    _save_meta(relation, out_dir, names, dtype)
+    for name in set(previous) - set(names):
+        shutil.rmtree(os.path.join(out_dir, name), ignore_errors=True)
+    print(f"💾 Relation matrix saved to: {out_dir} ({relation_pair_count(relation)} pairs, {dtype})")
+
+def append_relation_matrix(relation, shard_df, out_dir, rows):
+    # 증분 저장: 저장본 뒤에 덧붙은 segment 와 shard_df 의 rows (새 action, merged_ids 가 바뀐 기존 action) 만 기록
+    # → 기존 쌍 배열과 action 줄은 다시 쓰지 않음
+    meta = _read_meta(out_dir)
+    names = list(meta["segments"])
+    for segment in relation_segments(relation)[len(names):]:
+        names.append(f"segment_{len(names)}")
+        _save_segment(segment, os.path.join(out_dir, names[-1]), _index_dtype(relation), meta["dtype"])
+
+    _append_actions(shard_df.loc[rows], os.path.join(out_dir, "actions.jsonl"), "a")
+    _save_meta(relation, out_dir, names, meta["dtype"])
+    print(f"💾 Relation matrix appended to: {out_dir} ({relation_pair_count(relation) - meta['pairs']} new pairs, "
+          f"{len(rows)} action rows, {len(names)} segments)")
+
+def load_relation_matrix(out_dir):
+    meta = _read_meta(out_dir)
+
+    # 배열은 read-only memmap 그대로 둠. 소비하는 쪽 (iter_relation_chunks) 이 chunk 단위로 int64 / float32 변환
+    segments = []
+    for name in meta["segments"]:
+        seg_dir = os.path.join(out_dir, name)
+        segment = {key: np.load(os.path.join(seg_dir, f"pairs_{key}.npy"), mmap_mode="r") for key in ("i", "j")}
+        segment.update({key: np.load(os.path.join(seg_dir, f"{key}.npy"), mmap_mode="r") for key in COMPONENTS})
+        segments.append(segment)
+    relation = {"n": meta["n"], "index": meta["index"], "segments": segments}
+
+    path = os.path.join(out_dir, "actions.jsonl")
+    if os.path.exists(path):
+        shard_df = pd.read_json(path, orient="records", lines=True, dtype=False, convert_dates=False)
+        shard_df = shard_df.drop_duplicates("_key", keep="last").set_index("_key").loc[meta["index"]]
+        shard_df.index.name = None
+    else:
+        shard_df = pd.read_json(os.path.join(out_dir, "actions.json"), orient="records", dtype=False, convert_dates=False)
+    shard_df.index = meta["index"]
+    return relation, shard_df
+
+def rederive_graphs(relation, shard_df, rst_threshold, causal_threshold, weights=None, rst_weights=None, max_gap=None):
+    rst_graph = build_rst_graph(shard_df, threshold=rst_threshold, relation=relation, weights=rst_weights)
+    causal_graph = infer_causal_paths(
+        shard_df, threshold=causal_threshold, weights=weights, relation=relation, rst_weights=rst_weights, max_gap=max_gap
+    )
+    combined_graph = build_combined_graph(rst_graph, causal_graph, relation=relation)
+    return rst_graph, causal_graph, combined_graph
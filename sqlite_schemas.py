@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+
+# 알려진 아티팩트 DB: 테이블별 컬럼 projection, 타임스탬프 컬럼/형식, 고정 T_S
+# "queries" 는 일반 테이블 순회보다 먼저 실행되고, "covered_tables" 는 일반 순회에서 제외됨
+KNOWN_SQLITE_SCHEMAS = {
+    "Favicons.db": {
+        "queries": [{
+            "source": "icon_mapping + favicon_bitmaps",
+            "sql": """
+            SELECT im.page_url, im.icon_id, fb.last_updated, fb.width, fb.height
+            FROM icon_mapping im
+            JOIN favicon_bitmaps fb ON im.icon_id = fb.icon_id
+            """,
+            "timestamp": ("last_updated", "webkit"),
+            "fixed_T_S": "2020-12-29T17:30:22"
+        }],
+        "covered_tables": ["icon_mapping", "favicon_bitmaps", "favicons", "meta"]
+    },
+    "tms_1.0.db": {
+        "tables": {
+            "TBL_MSG": {"timestamp": ("REG_DATE", "auto")}
+        }
+    },
+    "History": {
+        "tables": {
+            "urls": {"columns": ["url", "title", "visit_count", "last_visit_time"],
+                     "timestamp": ("last_visit_time", "webkit")},
+            "visits": {"columns": ["url", "visit_time", "from_visit", "transition"],
+                       "timestamp": ("visit_time", "webkit")},
+            "downloads": {"columns": ["target_path", "tab_url", "start_time", "end_time", "total_bytes"],
+                          "timestamp": ("start_time", "webkit")}
+        },
+        "covered_tables": ["meta", "segment_usage", "typed_url_sync_metadata"]
+    }
+}
+
+WEBKIT_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+def convert_timestamp(value, kind):
+    if value is None or value == "" or value == 0:
+        return None
+    try:
+        if kind == "webkit":
+            return (WEBKIT_EPOCH + timedelta(microseconds=int(value))).isoformat()
+        if kind == "unix_s":
+            return datetime.fromtimestamp(float(value), tz=timezone.utc).isoformat()
+        if kind == "unix_ms":
+            return datetime.fromtimestamp(float(value) / 1000, tz=timezone.utc).isoformat()
+        parsed = pd.to_datetime(str(value), errors="coerce")
+        return parsed.isoformat() if pd.notna(parsed) else None
+    except (ValueError, OverflowError, TypeError):
+        return None
+
+def get_sqlite_schema(db_name):
+    return KNOWN_SQLITE_SCHEMAS.get(db_name, {})
+
+def get_table_spec(schema, table):
+    for name, spec in schema.get("tables", {}).items():
+        if name.upper() == table.strip().upper():
+            return spec
+    return {}
@@ -0,0 +1,14 @@
+import pandas as pd
+from action_dedup import collapse_near_duplicates
+
+
+def test_actions_without_tokens_are_not_merged():
+    shard_df = pd.DataFrame({
+        "A": ["", "...", "!!", "user logged in to portal", "user logged in to portal"],
+        "T_A": ["2020-01-01T00:00:00Z"] * 5,
+        "T_S": [None] * 5,
+        "ID": ["f_0", "f_1", "f_2", "f_3", "f_4"],
+    })
+    result = collapse_near_duplicates(shard_df)
+
+    assert result["merged_ids"].tolist() == [["f_0"], ["f_1"], ["f_2"], ["f_3", "f_4"]]
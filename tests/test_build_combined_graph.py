@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("sentence_transformers")
+from relation_matrix import build_relation_matrix
+from build_rst_graph import build_rst_graph
+from infer_causal_paths import infer_causal_paths
+from build_combined_graph import build_combined_graph
+
+
+def _actions(texts):
+    return pd.DataFrame([{
+        "A": text, "T_A": f"2020-12-0{k + 1}T10:00:00", "T_S": "2020-12-29T17:30:22",
+        "C": text, "ID": f"f_{k}", "M": "{}",
+    } for k, text in enumerate(texts)])
+
+
+@pytest.mark.parametrize("texts, threshold", [
+    (["user login to browser"], 0.22),
+    (["order coffee with card", "send mail to user"], 0.99),
+])
+def test_combined_graph_without_edges(texts, threshold):
+    # action 이 하나뿐이거나 임계값을 넘는 쌍이 없어도 빈 엣지 그래프를 만듦
+    shard_df = _actions(texts)
+    relation = build_relation_matrix(shard_df)
+    rst = build_rst_graph(shard_df, threshold, relation=relation)
+    causal = infer_causal_paths(shard_df, threshold, relation=relation)
+    combined = build_combined_graph(rst, causal, relation=relation)
+
+    assert combined.number_of_nodes() == len(texts)
+    assert combined.number_of_edges() == 0
+    assert combined.to_networkx().number_of_edges() == 0
@@ -0,0 +1,73 @@
+import os
+import pytest
+
+pytest.importorskip("openai")
+# file_parser 가 import 시 OpenAI client 를 만듦 (요청은 보내지 않음)
+os.environ.setdefault("OPENAI_API_KEY", "test")
+import file_parser
+from file_parser import iter_token_chunks
+from llm_cache import LLMCache
+
+
+def test_single_long_piece_chunks_overlap_on_word_boundaries():
+    # JSON/XML/HTML 처럼 텍스트 전체가 한 조각으로 들어와도 청크끼리 겹치고 단어 중간에서 자르지 않음
+    words = [f"w{k}" for k in range(3000)]
+    text = " ".join(words)
+    chunks = list(iter_token_chunks([text], token_budget=100, overlap_tokens=20))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 * 4 for chunk in chunks)
+    vocabulary = set(words)
+    for prev, chunk in zip(chunks, chunks[1:]):
+        first, last = chunk.split()[0], prev.split()[-1]
+        assert first in vocabulary and last in vocabulary
+        overlap = prev[prev.index(" " + first + " ") + 1:]
+        assert chunk.startswith(overlap)
+        assert len(overlap) >= 20 * 4 // 2
+    assert chunks[-1].split()[-1] == words[-1]
+
+
+def test_small_pieces_carry_overlap_into_next_chunk():
+    pieces = [f"record {k} user=alice action=login\n" for k in range(200)]
+    chunks = list(iter_token_chunks(pieces, token_budget=100, overlap_tokens=20))
+
+    assert len(chunks) > 1
+    for prev, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split("\n")[1] + "\n" in prev
+    assert "".join(pieces).endswith(chunks[-1].split("\n", 1)[1])
+
+
+def test_unparseable_llm_output_is_not_cached(tmp_path, monkeypatch):
+    # 잘린 응답은 캐시에 남지 않고, 다음 호출에서 다시 요청됨
+    cache = LLMCache(str(tmp_path / "cache.sqlite"))
+    outputs = iter(['{"A": "login", "T_A"', '```json\n{"A": "login"}\n```'])
+    monkeypatch.setattr(file_parser, "llm_cache", cache)
+    monkeypatch.setattr(file_parser.llm_scheduler, "call", lambda request, est_tokens=0: _response(next(outputs)))
+
+    first = file_parser.call_gpt("sys", "prompt", "text", "v1", temperature=0.4, max_tokens=10)
+    assert cache.get(file_parser.LLM_MODEL, "v1", 0.4, "text") is None
+    second = file_parser.call_gpt("sys", "prompt", "text", "v1", temperature=0.4, max_tokens=10)
+
+    assert first != second
+    assert cache.get(file_parser.LLM_MODEL, "v1", 0.4, "text") == second
+
+
+def _response(text):
+    message = type("Message", (), {"content": text})
+    choice = type("Choice", (), {"message": message})
+    return type("Response", (), {"choices": [choice], "usage": None})
+
+
+def test_large_html_is_read_to_the_end(tmp_path, monkeypatch):
+    # FILE_MAX_READ_BYTES 보다 큰 HTML 도 잘리지 않고 끝까지 텍스트로 나옴
+    body = "".join(f"<p>record {k} user=alice</p><script>var x = {k};</script>\n" for k in range(50000))
+    path = tmp_path / "big.html"
+    path.write_text(f"<html><body>{body}</body></html>", encoding="utf-8")
+    monkeypatch.setattr(file_parser, "FILE_MAX_READ_BYTES", 1 << 16)
+
+    head = path.read_bytes()[:file_parser.HEAD_BYTES]
+    text = "".join(file_parser.iter_html_pieces(str(path), head))
+
+    assert text.split().count("record") == 50000
+    assert "record 49999 user=alice" in text
+    assert "var x" not in text
@@ -0,0 +1,88 @@
+import json
+import random
+import networkx as nx
+import pandas as pd
+import pytest
+
+pytest.importorskip("sentence_transformers")
+from relation_matrix import build_relation_matrix
+from build_rst_graph import build_rst_graph, assign_array_groups
+from infer_causal_paths import infer_causal_paths
+from build_combined_graph import build_combined_graph
+from incremental_graph import add_actions_to_graphs, save_graphs, load_graphs
+from relation_store import save_relation_matrix, append_relation_matrix, load_relation_matrix, rederive_graphs
+
+WORDS = "open file send mail coffee order pay card login user browser visit page".split()
+
+
+def _file_actions(file_id, count, rng):
+    return [{
+        "A": " ".join(rng.sample(WORDS, 3)),
+        "T_A": f"2020-12-{rng.randint(1, 20):02d}T{rng.randint(10, 19)}:00:00",
+        "T_S": "2020-12-29T17:30:22",
+        "C": " ".join(rng.sample(WORDS, 4)),
+        "ID": f"{file_id}_{k}",
+        "M": json.dumps({"ip_address": rng.choice(["10.0.0.1", "10.0.0.7", None])}),
+    } for k in range(count)]
+
+
+def _full_build(shard_df, groups=False):
+    relation = build_relation_matrix(shard_df)
+    rst = build_rst_graph(shard_df, 0.22, relation=relation)
+    causal = infer_causal_paths(shard_df, 0.13, relation=relation)
+    combined = build_combined_graph(rst, causal, relation=relation)
+    if groups:
+        assign_array_groups(rst)
+        assign_array_groups(combined)
+    return relation, {"rst": rst, "causal": causal, "combined": combined}
+
+
+def _edge_set(G, ids):
+    # node 이름 (위치) 대신 action ID 로 비교. RST 엣지는 무방향
+    edges = set()
+    for u, v, data in G.edges(data=True):
+        key = frozenset((ids[u], ids[v])) if data.get("type") == "rst" or not G.is_directed() else (ids[u], ids[v])
+        edges.add((key, data.get("type"), data.get("weight"), data.get("causal_weight")))
+    return edges
+
+
+def _split_folder():
+    rng = random.Random(7)
+    files = {name: _file_actions(name, 12, rng) for name in ("a", "b", "c", "d", "e")}
+    # 새 파일 "c" 는 폴더 경로 순서상 가운데 → 전체 재구성에서는 기존 action 들 사이에 위치
+    full_df = pd.DataFrame([row for name in sorted(files) for row in files[name]])
+    known_df = pd.DataFrame([row for name in sorted(files) if name != "c" for row in files[name]])
+    return full_df, known_df, pd.DataFrame(files["c"])
+
+
+def test_incremental_update_matches_full_build_for_file_sorted_mid_folder(tmp_path):
+    full_df, known_df, new_df = _split_folder()
+
+    relation, graphs = _full_build(known_df, groups=True)
+    save_graphs(dict(graphs, rdf=nx.DiGraph()), str(tmp_path))
+    relation, shard_df, updated = add_actions_to_graphs(new_df, known_df, relation, load_graphs(str(tmp_path)), 0.22, 0.13)
+
+    _, expected = _full_build(full_df)
+    incremental_ids = shard_df["ID"].to_dict()
+    full_ids = full_df["ID"].to_dict()
+    for name in ("rst", "causal", "combined"):
+        assert updated[name].number_of_edges() == expected[name].number_of_edges()
+        assert _edge_set(updated[name], incremental_ids) == _edge_set(expected[name].to_networkx(), full_ids)
+    assert all(group is not None for group in updated["combined"].node_attrs["group"])
+
+
+def test_appended_relation_segment_rederives_full_build(tmp_path):
+    # 증분 저장 (기존 쌍 + 새 쌍 segment) 을 불러와 다시 만든 그래프가 전체 재구성과 같음
+    full_df, known_df, new_df = _split_folder()
+    relation, graphs = _full_build(known_df)
+    save_relation_matrix(relation, known_df, str(tmp_path), dtype="float32")
+    relation, shard_df, _ = add_actions_to_graphs(new_df, known_df, relation, graphs, 0.22, 0.13)
+    append_relation_matrix(relation, shard_df, str(tmp_path), list(shard_df.index[len(known_df):]))
+
+    stored, stored_df = load_relation_matrix(str(tmp_path))
+    assert len(stored["segments"]) == 2
+    assert stored_df["ID"].tolist() == shard_df["ID"].tolist()
+    _, expected = _full_build(full_df)
+    stored_ids, full_ids = stored_df["ID"].to_dict(), full_df["ID"].to_dict()
+    for name, G in zip(("rst", "causal", "combined"), rederive_graphs(stored, stored_df, 0.22, 0.13)):
+        assert _edge_set(G, stored_ids) == _edge_set(expected[name], full_ids)
@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sentence_transformers")
+from infer_causal_paths import infer_causal_paths
+
+
+def _relation(n, value=1.0):
+    # 모든 쌍 (i < j) 의 성분을 같은 값으로 둔 relation
+    i, j = np.triu_indices(n, k=1)
+    components = {name: np.full(len(i), value, dtype=np.float32) for name in ("f_I", "f_S", "f_C", "f_M")}
+    return {"n": n, "index": list(range(n)), "i": i.astype(np.int64), "j": j.astype(np.int64), **components}
+
+
+def test_missing_time_rows_are_skipped():
+    # 시각이 없는 action (T_A, T_S 모두 NaT / 빈 값) 은 어느 방향으로도 causal 엣지를 갖지 않음
+    shard_df = pd.DataFrame({
+        "A": ["login", "download file", "logout", "unknown event"],
+        "T_A": ["2024-01-01T10:00:00Z", "2024-01-01T10:05:00Z", None, pd.NaT],
+        "T_S": [None, None, "2024-01-01T10:10:00Z", "NaT"],
+        "ID": ["u1", "u1", "u1", "u1"],
+        "C": ["", "", "", ""],
+        "M": ["{}", "{}", "{}", "{}"],
+    })
+    G = infer_causal_paths(shard_df, threshold=0.0, relation=_relation(len(shard_df)))
+
+    edges = set(G.edges())
+    assert edges == {(0, 1), (0, 2), (1, 2)}
+    assert shard_df["T_quality"].tolist()[3] == "missing"
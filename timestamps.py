@@ -0,0 +1,102 @@
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse as date_parse
+from config import NAIVE_TIMEZONE
+
+# action 시각은 UTC epoch milliseconds (int64) 로 저장, 없으면 MISSING_EPOCH
+# T_quality: "iso" (ISO-8601 fast path), "epoch" (숫자 epoch), "fallback" (dateutil),
+#            "file_time" (T_A 가 없거나 파싱 실패 → T_S 사용), "invalid" (T_A 파싱 실패, T_S 없음), "missing"
+MISSING_EPOCH = np.iinfo(np.int64).min
+NULL_STRINGS = ["", "none", "null", "nan", "nat"]
+TZ_SUFFIX = r"(?:Z|[+-]\d{2}:?\d{2})$"
+
+def _localize_naive(parsed, naive_tz):
+    # timezone 이 없는 값은 naive_tz 기준 현지 시각으로 해석
+    if naive_tz in (None, "UTC"):
+        return parsed
+    return (parsed.dt.tz_localize(None)
+            .dt.tz_localize(naive_tz, ambiguous="NaT", nonexistent="shift_forward")
+            .dt.tz_convert("UTC"))
+
+@lru_cache(maxsize=65536)
+def _parse_fallback(text, naive_tz):
+    try:
+        dt = date_parse(text)
+    except (ValueError, OverflowError, TypeError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=ZoneInfo(naive_tz or "UTC"))
+    try:
+        return int(dt.timestamp() * 1000)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+def normalize_timestamps(values, naive_tz=NAIVE_TIMEZONE):
+    # → (epoch ms int64 배열, quality 배열). 같은 형식끼리 묶어 한 번에 파싱
+    text = pd.Series(values, dtype=object)
+    text = text.where(text.notna(), None).astype("string").str.strip()
+    epochs = np.full(len(text), MISSING_EPOCH, dtype=np.int64)
+    quality = np.full(len(text), "missing", dtype=object)
+    present = (text.notna() & ~text.str.lower().isin(NULL_STRINGS)).fillna(False).to_numpy(bool)
+    quality[present] = "invalid"
+
+    # 숫자 epoch (초 10자리 / 밀리초 13자리)
+    digits = present & text.str.fullmatch(r"\d{10}(?:\d{3})?").fillna(False).to_numpy(bool)
+    if digits.any():
+        raw = text[digits].astype("int64").to_numpy()
+        epochs[digits] = np.where(text[digits].str.len().to_numpy() == 10, raw * 1000, raw)
+        quality[digits] = "epoch"
+
+    # ISO-8601 fast path
+    iso = present & ~digits & text.str.match(r"\d{4}-\d{2}-\d{2}").fillna(False).to_numpy(bool)
+    if iso.any():
+        subset = text[iso]
+        parsed = pd.to_datetime(subset, format="ISO8601", errors="coerce", utc=True)
+        naive = ~subset.str.contains(TZ_SUFFIX, regex=True).fillna(False)
+        if naive.any():
+            parsed[naive] = _localize_naive(parsed[naive], naive_tz)
+        ok = parsed.notna().to_numpy(bool)
+        idx = np.flatnonzero(iso)[ok]
+        epochs[idx] = parsed[ok].dt.as_unit("ms").astype("int64").to_numpy()
+        quality[idx] = "iso"
+
+    # 나머지는 dateutil (같은 문자열은 한 번만 파싱)
+    rest = np.flatnonzero(present & (quality == "invalid"))
+    for i, value in zip(rest, text.iloc[rest]):
+        epoch = _parse_fallback(value, naive_tz)
+        if epoch is not None:
+            epochs[i] = epoch
+            quality[i] = "fallback"
+    return epochs, quality
+
+def normalize_action_times(t_a, t_s, naive_tz=NAIVE_TIMEZONE):
+    # T_A 를 우선 사용하고, 없거나 파싱에 실패하면 T_S (파일/레코드 시각) 로 대체
+    epochs, quality = normalize_timestamps(t_a, naive_tz)
+    unresolved = np.isin(quality, ["missing", "invalid"])
+    if unresolved.any():
+        t_s = pd.Series(t_s, dtype=object).to_numpy()[unresolved]
+        s_epochs, s_quality = normalize_timestamps(t_s, naive_tz)
+        found = ~np.isin(s_quality, ["missing", "invalid"])
+        idx = np.flatnonzero(unresolved)[found]
+        epochs[idx] = s_epochs[found]
+        quality[idx] = "file_time"
+    return epochs, quality
+
+def add_action_times(df, naive_tz=NAIVE_TIMEZONE):
+    # T_epoch / T_quality 가 없는 row 만 채움 (store 에 이미 저장된 값은 재사용)
+    if "T_quality" not in df.columns:
+        df["T_quality"] = None
+    if "T_epoch" not in df.columns:
+        df["T_epoch"] = MISSING_EPOCH
+    todo = df["T_quality"].isna().to_numpy(bool)
+    epochs = pd.to_numeric(df["T_epoch"], errors="coerce").fillna(MISSING_EPOCH).to_numpy(np.int64, copy=True)
+    quality = df["T_quality"].to_numpy(dtype=object, copy=True)
+    if todo.any():
+        epochs[todo], quality[todo] = normalize_action_times(
+            df["T_A"].to_numpy(dtype=object)[todo], df["T_S"].to_numpy(dtype=object)[todo], naive_tz
+        )
+    df["T_epoch"] = epochs
+    df["T_quality"] = quality
+    return df